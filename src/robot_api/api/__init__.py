@@ -1,4 +1,4 @@
 from robot_api.api.ansible import Ansible
-from robot_api.api.dockerize import Docker
+from robot_api.api.dockerize import Docker, BaseImage, ContainerWatcher, get_client
 from robot_api.api.aggregation import Aggregation
 from robot_api.api.upload import Forum, Mattermost, Slack
@@ -10,28 +10,41 @@ Attributes:
     logger (Logger): Module based logger
 
 """
+import hashlib
 import json
 import socket
 import sqlite3
-from os import path, getcwd, walk
+from os import path, getcwd, makedirs, walk
 import glob
 import re
 import logging
 import multiprocessing
 from functools import partial
+from urllib.parse import urlsplit
 from tqdm import tqdm
 import requests
+import urllib3
 
 from robot_api.parse import join_abs
+from robot_api.api import database
 
-def reverse_ip_lookup(domain, queue, filename):
-    """Read in filesnames and use regex to extract all ips and hostnames.
+PROBE_TIMEOUT = 3
+PROBE_BYTES = 64 * 1024
+# Headers that differ between two requests to the same page
+VOLATILE_HEADERS = {"date", "expires", "age", "set-cookie", "content-length",
+                    "connection", "keep-alive", "via", "x-cache", "x-served-by",
+                    "x-timer", "x-request-id", "x-amz-request-id", "x-amz-cf-id",
+                    "cf-ray", "report-to", "nel"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def compile_patterns(domain):
+    """Regexes matching ips and hostnames of domain in scanner output
 
     Args:
-        filename: string to filename to parse
+        domain (str): target domain
 
     Returns:
-        A list of tuples containing the extracted host and ip
+        A tuple (ip regex, hostname regex)
     """
     ip_reg = re.compile(
         r"(?:(?:1\d\d|2[0-5][0-5]|2[0-4]\d|0?[1-9]\d|0?0?\d)\.){3}(?:1\d\d|2[0-5][0-5]|2[0-4]\d|0?[1-9]\d|0?0?\d)")
@@ -39,25 +52,57 @@ def reverse_ip_lookup(domain, queue, filename):
         r"([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])(\.([a-zA-Z0-9]|[a-zA-Z0-9][a-zA-Z0-9\-]{0,61}[a-zA-Z0-9]))*?\." 
         + domain
         + r"(\:?[0-9]{1,5})?")
+    return ip_reg, hostname_reg
+
+
+def parse_line(line, ip_reg, hostname_reg):
+    """Extract the host and ip of a line of scanner output
+
+    A missing ip or hostname is looked up in DNS.
+
+    Args:
+        line (str): line of scanner output
+        ip_reg (re.Pattern): ip regex from compile_patterns
+        hostname_reg (re.Pattern): hostname regex from compile_patterns
+
+    Returns:
+        A tuple (host, ip), None if the line holds neither
+    """
+    _host = hostname_reg.search(line)
+    if _host is not None:
+        _host = _host.group(0)
+    _ip = ip_reg.search(line)
+    if _ip is not None:
+        _ip = _ip.group(0)
+    try:
+        if _host is not None and _ip is None:
+            _ip = socket.gethostbyname(_host)
+        if _ip is not None and _host is None:
+            _host = socket.gethostbyaddr(_ip)
+    except Exception:
+        pass
+    if _host or _ip:
+        return (_host, _ip)
+    return None
+
+
+def reverse_ip_lookup(domain, queue, filename):
+    """Read in filesnames and use regex to extract all ips and hostnames.
+
+    Args:
+        filename: string to filename to parse
+
+    Returns:
+        A list of tuples containing the extracted host and ip
+    """
+    ip_reg, hostname_reg = compile_patterns(domain)
     results = []
     try:
         with open(filename, "r", encoding='utf-8') as _file:
             for line in tqdm(_file.readlines(), desc=f"{filename} parsing..."):
-                _host = hostname_reg.search(line)
-                if _host is not None:
-                    _host = _host.group(0)
-                _ip = ip_reg.search(line)
-                if _ip is not None:
-                    _ip = _ip.group(0)
-                try:
-                    if _host is not None and _ip is None:
-                        _ip = socket.gethostbyname(_host)
-                    if _ip is not None and _host is None:
-                        _host = socket.gethostbyaddr(_ip)
-                except Exception:
-                    pass
-                if _host or _ip:
-                    queue.put((_host, _ip))
+                found = parse_line(line, ip_reg, hostname_reg)
+                if found is not None:
+                    queue.put(found)
     except Exception:
         pass
 
@@ -102,6 +147,51 @@ def get_headers(queue, target):
         pass
     queue.put([target, (http, https)])
 
+
+def probe_fingerprint(url):
+    """Light probe of url used to find vhosts serving the same response
+
+    A single request without following redirects. The fingerprint hashes
+    the status, the headers that are not request specific and the first
+    PROBE_BYTES of the body, with the hostname of the url blanked out so a
+    default page or redirect mentioning the vhost still matches.
+
+    Args:
+        url (str): scheme://host[:port][/path] to probe
+
+    Returns:
+        A tuple (url, ip, fingerprint), ip and fingerprint are None if the
+        host does not resolve or does not answer
+    """
+    host = urlsplit(url).hostname
+    if not host:
+        return url, None, None
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64; rv:54.0) Gecko/20100101 Firefox/54.0"
+    }
+    try:
+        ip = socket.gethostbyname(host)
+        with requests.get(url,
+                          headers=headers,
+                          timeout=PROBE_TIMEOUT,
+                          verify=False,
+                          allow_redirects=False,
+                          stream=True) as response:
+            body = response.raw.read(PROBE_BYTES, decode_content=True)
+            status = response.status_code
+            response_headers = sorted((key.lower(), value)
+                                      for key, value in response.headers.items()
+                                      if key.lower() not in VOLATILE_HEADERS)
+    except (requests.RequestException, urllib3.exceptions.HTTPError, OSError, ValueError):
+        # Reading the raw body raises urllib3 errors, e.g. on a broken chunked encoding
+        return url, None, None
+    blank = re.compile(re.escape(host), re.IGNORECASE)
+    digest = hashlib.sha256(str(status).encode())
+    for key, value in response_headers:
+        digest.update(f"{key}: {blank.sub('', value)}\n".encode())
+    digest.update(blank.sub('', body.decode('utf-8', errors='replace')).encode())
+    return url, ip, digest.hexdigest()[:16]
+
 class Aggregation:
     """Aggregation module
     """
@@ -143,7 +233,7 @@ class Aggregation:
 
         Returns:
         """
-        dbconn = sqlite3.connect(self.dbfile)
+        dbconn = database.connect(self.dbfile)
         try:
             dbcurs = dbconn.cursor()
 
@@ -216,88 +306,319 @@ class Aggregation:
         finally:
             dbconn.close()
 
-    def _build_db(self, queue, cursor):
+    def live_endpoints(self):
+        """Scheme and host of every endpoint that answered the header probe
+
+        Only filled once headers() ran, e.g. gather with --headers. Rows are
+        probed by ip and by hostname, so an endpoint is the hostname if the
+        row has one and the ip otherwise.
+
+        Returns:
+            A list of distinct urls such as https://www.example.com, sorted by host
+        """
+        if not path.exists(self.dbfile):
+            return []
+        dbconn = database.connect(self.dbfile)
+        try:
+            rows = dbconn.execute("""SELECT DISTINCT 'http://' || COALESCE(hostname, ip)
+                                    FROM data
+                                    WHERE domain = ?
+                                    AND http_headers IS NOT NULL
+                                    AND COALESCE(hostname, ip) IS NOT NULL
+                                    UNION
+                                    SELECT DISTINCT 'https://' || COALESCE(hostname, ip)
+                                    FROM data
+                                    WHERE domain = ?
+                                    AND https_headers IS NOT NULL
+                                    AND COALESCE(hostname, ip) IS NOT NULL""",
+                                  (self.domain.replace('.', '_'),) * 2).fetchall()
+        except sqlite3.Error:
+            self.logger.exception("Error in live_endpoints")
+            return []
+        finally:
+            dbconn.close()
+        return sorted((row[0] for row in rows), key=lambda url: url.split("://")[::-1])
+
+    def dump_live_hosts(self):
+        """Write live_endpoints to aggregated/aggregated_live_hostnames.txt
+
+        Returns:
+            A tuple (path of the file, number of endpoints written),
+            the path is None if the file could not be written
+        """
+        filename = join_abs(self.output_dir, 'aggregated', 'aggregated_live_hostnames.txt')
+        endpoints = self.live_endpoints()
+        try:
+            makedirs(path.dirname(filename), exist_ok=True)
+            with open(filename, 'w') as _file:
+                _file.write("\n".join(endpoints))
+        except OSError:
+            print("Failed to write live hosts to aggregated directory")
+            self.logger.exception("Error in dump_live_hosts")
+            return None, 0
+        return filename, len(endpoints)
+
+    @staticmethod
+    def _create_alias_table(cursor):
+        """Create the table of endpoints skipped by collapse in favour of a representative
+
+        Args:
+            cursor (sqlite3.cursor): database cursor object
+
+        Returns:
+        """
+        cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS aliases (
+                            endpoint VARCHAR NOT NULL,
+                            representative VARCHAR NOT NULL,
+                            ip VARCHAR,
+                            fingerprint VARCHAR,
+                            domain VARCHAR NOT NULL,
+                            found TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                            PRIMARY KEY(domain, endpoint)
+                        )
+                        """)
+
+    def collapse(self, endpoints):
+        """Group endpoints by scheme, ip, port and response fingerprint
+
+        Every endpoint is probed once with probe_fingerprint. One
+        representative per group is kept, the shortest url, and the other
+        members are stored in the aliases table, replacing the aliases
+        recorded by the previous collapse of the domain. Endpoints that do
+        not resolve or answer the probe are kept as they are.
+
+        Args:
+            endpoints (List): urls such as https://www.example.com
+
+        Returns:
+            A list of the endpoints to inspect, in the order given
+        """
+        endpoints = list(dict.fromkeys(endpoints))
+        print("[*] Probing endpoints to collapse duplicate vhosts")
+        pool = multiprocessing.Pool(40)
+        probes = list(tqdm(pool.imap_unordered(probe_fingerprint, endpoints),
+                           total=len(endpoints),
+                           desc="Fingerprinting endpoints..."))
+        pool.close()
+        pool.join()
+
+        groups = {}
+        for url, ip, fingerprint in probes:
+            if fingerprint is not None:
+                parts = urlsplit(url)
+                key = (parts.scheme, ip, parts.port or DEFAULT_PORTS.get(parts.scheme), fingerprint)
+                groups.setdefault(key, []).append(url)
+
+        aliases = []
+        for (_, ip, _, fingerprint), urls in groups.items():
+            representative = min(urls, key=lambda url: (len(url), url))
+            aliases += [(url, representative, ip, fingerprint)
+                        for url in urls if url != representative]
+
+        domain_rep = self.domain.replace('.', '_')
+        try:
+            with database.connection(self.dbfile) as dbconn:
+                self._create_alias_table(dbconn.cursor())
+                with database.transaction(dbconn) as cursor:
+                    cursor.execute("DELETE FROM aliases WHERE domain = ?", (domain_rep,))
+                    cursor.executemany("""INSERT INTO aliases(endpoint, representative,
+                                            ip, fingerprint, domain)
+                                          VALUES (?, ?, ?, ?, ?)""",
+                                       ((*alias, domain_rep) for alias in aliases))
+        except sqlite3.Error:
+            print("[!] Could not record aliases, inspecting every endpoint")
+            self.logger.exception("Error in collapse")
+            return endpoints
+
+        skipped = {alias[0] for alias in aliases}
+        print(f"[*] Collapsed {len(endpoints)} endpoints to {len(endpoints) - len(skipped)}, "
+              f"{len(skipped)} recorded as aliases")
+        return [url for url in endpoints if url not in skipped]
+
+    def dump_collapsed(self, infile):
+        """Collapse the urls of infile into aggregated/aggregated_collapsed_hostnames.txt
+
+        Lines without a scheme are not probed and written as they are.
+
+        Args:
+            infile (str): file with one url per line
+
+        Returns:
+            A tuple (path of the file, number of endpoints written),
+            the path is None if a file could not be read or written
+        """
+        filename = join_abs(self.output_dir, 'aggregated', 'aggregated_collapsed_hostnames.txt')
+        try:
+            makedirs(path.dirname(filename), exist_ok=True)
+            with open(infile, 'r') as _file:
+                lines = [line.strip() for line in _file if line.strip()]
+            urls = [line for line in lines if "://" in line]
+            targets = [line for line in lines if "://" not in line] + self.collapse(urls)
+            with open(filename, 'w') as _file:
+                _file.write("\n".join(targets))
+        except OSError:
+            print("Failed to write collapsed hosts to aggregated directory")
+            self.logger.exception("Error in dump_collapsed")
+            return None, 0
+        return filename, len(targets)
+
+    @staticmethod
+    def _drain(queue):
+        """Yield items from queue until it is empty
+
+        Args:
+            queue (multiprocessing.Queue): queue filled by the worker pool
+
+        Returns:
+        """
+        while not queue.empty():
+            yield queue.get()
+
+    def _build_db(self, queue, dbconn):
         """Takes in ip/hostname data and inserts them into the database
 
+        Rows are written in short batched transactions so other Dr.ROBOT
+        processes sharing the database are not locked out.
+
         Args:
             queue (multiprocessing.Queue): list of tupes (host, ip)
-            cursor (sqlite3.cursor): database cursor object
+            dbconn (sqlite3.Connection): connection from database.connect
+
+        Returns:
+        """
+        self.insert_hosts(dbconn, self._drain(queue))
+
+    def insert_hosts(self, dbconn, hosts):
+        """Insert (host, ip) tuples from parse_line, existing hostnames are kept
+
+        Args:
+            dbconn (sqlite3.Connection): connection from open_db
+            hosts (Iterable): tuples (host, ip)
 
         Returns:
+            (int) number of rows inserted, hostnames already stored are not counted
         """
-        cursor.execute('BEGIN TRANSACTION')
         domain = self.domain.replace(".", "_")
-        while not queue.empty():
-            host, ipv4 = queue.get()
-            if host is not None and type(host) is not str:
-                host = host[0]
-            try:
-                cursor.execute("""INSERT OR IGNORE INTO data
-                        (ip, hostname, http_headers, https_headers, domain)
-                        VALUES (?,?, NULL, NULL, ?);""", (ipv4, host, domain))
-            except sqlite3.Error:
-                print(f"Issue with the following data: {ipv4} {host} {domain}")
-                self.logger.exception("Error in _build_db")
-
-        cursor.execute('COMMIT')
-
-    def aggregate(self, output_files=[], output_folders=[]):
+
+        def rows():
+            for host, ipv4 in hosts:
+                if host is not None and type(host) is not str:
+                    host = host[0]
+                yield (ipv4, host, domain)
+
+        def failed(row, _error):
+            ipv4, host, domain = row
+            print(f"Issue with the following data: {ipv4} {host} {domain}")
+            self.logger.error("Error in insert_hosts", exc_info=_error)
+
+        return database.write_batches(dbconn,
+                                      """INSERT OR IGNORE INTO data
+                                      (ip, hostname, http_headers, https_headers, domain)
+                                      VALUES (?,?, NULL, NULL, ?);""",
+                                      rows(),
+                                      on_error=failed)
+
+    def open_db(self):
+        """Connection to the database with the tables of the current domain created
+
+        Returns:
+            sqlite3.Connection, to be closed by the caller
+        """
+        dbconn = database.connect(self.dbfile)
+        try:
+            self._create_tables(dbconn)
+        except sqlite3.Error:
+            dbconn.close()
+            raise
+        return dbconn
+
+    def _create_tables(self, dbconn):
+        """Create tables used by Dr.ROBOT and the entry for the current domain
+
+        Args:
+            dbconn (sqlite3.Connection): connection from database.connect
+
+        Returns:
+        """
+        dbcurs = dbconn.cursor()
+        # Simple database that contains list of domains to run against
+        dbcurs.execute("""
+                        CREATE TABLE IF NOT EXISTS domains (
+                            domain VARCHAR PRIMARY KEY,
+                            UNIQUE(domain)
+                        )
+                        """)
+        # Setup database to keep all data from all targets. This allows us
+        # to use a single model for hosting with Django
+        dbcurs.execute("""
+                        CREATE TABLE IF NOT EXISTS data (
+                            domainid INTEGER PRIMARY KEY,
+                            ip VARCHAR,
+                            hostname VARCHAR,
+                            http_headers TEXT,
+                            https_headers TEXT,
+                            domain VARCHAR,
+                            found TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+                            FOREIGN KEY(domain) REFERENCES domains(domain),
+                            UNIQUE(hostname)
+                        )
+                        """)
+        self._create_search_index(dbcurs)
+        self._create_run_table(dbcurs)
+        # Quickly create entry in domains table.
+        with database.transaction(dbconn) as cursor:
+            cursor.execute("INSERT OR IGNORE INTO domains(domain) VALUES (?)",
+                           (self.domain.replace('.', '_'),))
+
+    def output_paths(self, output_files=[], output_folders=[], warn=True):
+        """Files to aggregate from the output files and folders of the tools
+
+        Args:
+            output_files: list of output files referenced in config.json
+            output_folders: list of folders to for aggregation
+            warn: print a warning for output files that do not exist
+
+        Returns:
+            A list of file paths
+        """
+        all_files = []
+        for name in output_files:
+            if path.isfile(join_abs(self.output_dir, name)):
+                all_files += [join_abs(self.output_dir, name)]
+            elif path.isfile(name):
+                all_files += [name]
+            elif warn:
+                print(
+                    f"[!] File {name} does not exist, verify scan results")
+
+        for folder in output_folders:
+            for root, _, files in walk(
+                    join_abs(self.output_dir, folder)):
+                for _file in files:
+                    if path.isfile(join_abs(root, _file)):
+                        all_files += [join_abs(root, _file)]
+        return all_files
+
+    def aggregate(self, output_files=[], output_folders=[], ingested=None):
         """Aggregates all output from scanners into the database
 
         Args:
             output_files: list of output files referenced in config.json
             output_folders: list of folders to for aggregation
+            ingested: file path -> bytes already read by an OutputWatcher,
+                files that did not grow since are skipped
 
         Returns:
         """
+        ingested = ingested or {}
+        dbconn = database.connect(self.dbfile)
         try:
+            # Foreign keys are enabled by database.connect
+            self._create_tables(dbconn)
 
-            dbconn = sqlite3.connect(self.dbfile)
-            dbcurs = dbconn.cursor()
-            # Enable foreign key support
-            dbcurs.execute("PRAGMA foreign_keys=1")
-            # Simple database that contains list of domains to run against
-            dbcurs.execute("""
-                            CREATE TABLE IF NOT EXISTS domains (
-                                domain VARCHAR PRIMARY KEY,
-                                UNIQUE(domain)
-                            )
-                            """)
-            # Setup database to keep all data from all targets. This allows us
-            # to use a single model for hosting with Django
-            dbcurs.execute("""
-                            CREATE TABLE IF NOT EXISTS data (
-                                domainid INTEGER PRIMARY KEY,
-                                ip VARCHAR,
-                                hostname VARCHAR,
-                                http_headers TEXT,
-                                https_headers TEXT,
-                                domain VARCHAR,
-                                found TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
-                                FOREIGN KEY(domain) REFERENCES domains(domain),
-                                UNIQUE(hostname)
-                            )
-                            """)
-            # Quickly create entry in domains table.
-            dbcurs.execute(f"INSERT OR IGNORE INTO domains(domain) VALUES ('{self.domain.replace('.', '_')}')")
-            dbconn.commit()
-
-            all_files = []
-            for name in output_files:
-                if path.isfile(join_abs(self.output_dir, name)):
-                    all_files += [join_abs(self.output_dir, name)]
-                elif path.isfile(name):
-                    all_files += [name]
-                else:
-                    print(
-                        f"[!] File {name} does not exist, verify scan results")
-
-            for folder in output_folders:
-                for root, _, files in walk(
-                        join_abs(self.output_dir, folder)):
-                    for _file in files:
-                        if path.isfile(join_abs(root, _file)):
-                            all_files += [join_abs(root, _file)]
+            all_files = [name for name in self.output_paths(output_files, output_folders)
+                         if ingested.get(name) != path.getsize(name)]
             # multi_queue = multiprocessing.Queue()
             qu_manager = multiprocessing.Manager()
             pool = multiprocessing.Pool(5) 
@@ -305,8 +626,7 @@ class Aggregation:
             reverse_partial = partial(reverse_ip_lookup, self.domain, queue)
             pool.map(reverse_partial, all_files)
             pool.close()
-            self._build_db(queue, dbcurs)
-            dbconn.commit()
+            self._build_db(queue, dbconn)
         except sqlite3.Error:
             self.logger.exception("Error in aggregation")
         finally:
@@ -314,13 +634,299 @@ class Aggregation:
 
 
 
+    @staticmethod
+    def _create_run_table(cursor):
+        """Create the table holding build/run durations of every scanner run
+
+        Args:
+            cursor (sqlite3.cursor): database cursor object
+
+        Returns:
+        """
+        cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS scanner_runs (
+                            runid INTEGER PRIMARY KEY,
+                            scanner VARCHAR NOT NULL,
+                            domain VARCHAR,
+                            build_seconds REAL,
+                            run_seconds REAL,
+                            output_bytes INTEGER,
+                            exit_code INTEGER,
+                            timed_out INTEGER DEFAULT 0,
+                            started TIMESTAMP,
+                            stopped TIMESTAMP
+                        )
+                        """)
+
+    @staticmethod
+    def _create_stats_table(cursor):
+        """Create the table holding resource samples of every scanner run
+
+        Network and block I/O are the counters of the container at the
+        time of the sample, the last sample of a run holds its totals.
+
+        Args:
+            cursor (sqlite3.cursor): database cursor object
+
+        Returns:
+        """
+        cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS scanner_stats (
+                            runid INTEGER NOT NULL
+                                REFERENCES scanner_runs(runid) ON DELETE CASCADE,
+                            sampled TIMESTAMP,
+                            cpu_percent REAL,
+                            rss_bytes INTEGER,
+                            net_rx_bytes INTEGER,
+                            net_tx_bytes INTEGER,
+                            block_read_bytes INTEGER,
+                            block_write_bytes INTEGER
+                        )
+                        """)
+        cursor.execute("""CREATE INDEX IF NOT EXISTS scanner_stats_runid
+                        ON scanner_stats(runid)""")
+
+    def record_runs(self, scanners):
+        """Store the durations, output size and resource samples of finished scanners
+
+        Args:
+            scanners (List): Docker/Native objects of the phase that just finished
+
+        Returns:
+        """
+        domain = self.domain.replace(".", "_")
+        try:
+            with database.connection(self.dbfile) as dbconn:
+                self._create_run_table(dbconn.cursor())
+                self._create_stats_table(dbconn.cursor())
+                for scanner in scanners:
+                    with database.transaction(dbconn) as cursor:
+                        cursor.execute("""INSERT INTO scanner_runs
+                                       (scanner, domain, build_seconds, run_seconds,
+                                       output_bytes, exit_code, timed_out,
+                                       started, stopped)
+                                       VALUES (?,?,?,?,?,?,?,
+                                       datetime(?, 'unixepoch'),
+                                       datetime(?, 'unixepoch'))""",
+                                       (scanner.name,
+                                        domain,
+                                        scanner.build_seconds,
+                                        scanner.run_seconds,
+                                        scanner.output_size(),
+                                        scanner.exit_code,
+                                        int(scanner.timed_out),
+                                        scanner.started,
+                                        scanner.stopped))
+                        runid = cursor.lastrowid
+                        cursor.executemany("""INSERT INTO scanner_stats
+                                           (runid, sampled, cpu_percent, rss_bytes,
+                                           net_rx_bytes, net_tx_bytes,
+                                           block_read_bytes, block_write_bytes)
+                                           VALUES (?, datetime(?, 'unixepoch'),
+                                           ?,?,?,?,?,?)""",
+                                           [(runid, *sample) for sample in scanner.samples])
+        except sqlite3.Error:
+            self.logger.exception("Error in record_runs")
+
+    def run_history(self):
+        """Average run duration of every scanner over all recorded runs
+
+        Runs that were stopped by a timeout are included, they are a lower
+        bound of how long the scanner takes.
+
+        Returns:
+            (Dict) scanner name -> average run seconds
+        """
+        if not path.exists(self.dbfile):
+            return {}
+        try:
+            with database.connection(self.dbfile) as dbconn:
+                dbcurs = dbconn.cursor()
+                self._create_run_table(dbcurs)
+                return dict(dbcurs.execute("""SELECT scanner, AVG(run_seconds)
+                                            FROM scanner_runs
+                                            WHERE run_seconds IS NOT NULL
+                                            GROUP BY scanner""").fetchall())
+        except sqlite3.Error:
+            self.logger.exception("Error in run_history")
+            return {}
+
+    _RUN_STATS = """WITH per_run AS (
+                        SELECT runid,
+                            AVG(cpu_percent) AS cpu_avg,
+                            MAX(cpu_percent) AS cpu_max,
+                            MAX(rss_bytes) AS rss_max,
+                            MAX(net_rx_bytes) AS net_rx,
+                            MAX(net_tx_bytes) AS net_tx,
+                            MAX(block_read_bytes) AS block_read,
+                            MAX(block_write_bytes) AS block_write
+                        FROM scanner_stats
+                        GROUP BY runid)"""
+
+    def _domain_filter(self):
+        """WHERE clause and parameters limiting a report to the current domain, if any"""
+        if not self.domain:
+            return "", ()
+        return "WHERE runs.domain = ?", (self.domain.replace(".", "_"),)
+
+    def scanner_stats(self):
+        """Resource usage of every scanner over all of its recorded runs
+
+        Returns:
+            A list of tuples (scanner, runs, timed out runs, average run seconds,
+            average cpu %, peak cpu %, peak rss bytes, average network rx/tx bytes,
+            average block read/write bytes, average output bytes)
+        """
+        if not path.exists(self.dbfile):
+            return []
+        where, params = self._domain_filter()
+        try:
+            with database.connection(self.dbfile) as dbconn:
+                dbcurs = dbconn.cursor()
+                self._create_run_table(dbcurs)
+                self._create_stats_table(dbcurs)
+                return dbcurs.execute(f"""{self._RUN_STATS}
+                                      SELECT runs.scanner, COUNT(*), SUM(runs.timed_out),
+                                        AVG(runs.run_seconds),
+                                        AVG(per_run.cpu_avg), MAX(per_run.cpu_max),
+                                        MAX(per_run.rss_max),
+                                        AVG(per_run.net_rx), AVG(per_run.net_tx),
+                                        AVG(per_run.block_read), AVG(per_run.block_write),
+                                        AVG(runs.output_bytes)
+                                      FROM scanner_runs AS runs
+                                      LEFT JOIN per_run USING (runid)
+                                      {where}
+                                      GROUP BY runs.scanner
+                                      ORDER BY runs.scanner""", params).fetchall()
+        except sqlite3.Error:
+            self.logger.exception("Error in scanner_stats")
+            return []
+
+    def run_stats(self, limit=20):
+        """Resource usage of the most recent scanner runs
+
+        Args:
+            limit (int): number of runs to return
+
+        Returns:
+            A list of tuples (runid, scanner, domain, started, run seconds,
+            exit code, timed out, average cpu %, peak cpu %, peak rss bytes,
+            network rx/tx bytes, block read/write bytes, output bytes)
+        """
+        if not path.exists(self.dbfile):
+            return []
+        where, params = self._domain_filter()
+        try:
+            with database.connection(self.dbfile) as dbconn:
+                dbcurs = dbconn.cursor()
+                self._create_run_table(dbcurs)
+                self._create_stats_table(dbcurs)
+                return dbcurs.execute(f"""{self._RUN_STATS}
+                                      SELECT runs.runid, runs.scanner, runs.domain,
+                                        runs.started, runs.run_seconds,
+                                        runs.exit_code, runs.timed_out,
+                                        per_run.cpu_avg, per_run.cpu_max, per_run.rss_max,
+                                        per_run.net_rx, per_run.net_tx,
+                                        per_run.block_read, per_run.block_write,
+                                        runs.output_bytes
+                                      FROM scanner_runs AS runs
+                                      LEFT JOIN per_run USING (runid)
+                                      {where}
+                                      ORDER BY runs.runid DESC
+                                      LIMIT ?""", (*params, limit)).fetchall()
+        except sqlite3.Error:
+            self.logger.exception("Error in run_stats")
+            return []
+
+    def _create_search_index(self, cursor):
+        """Create the full text search index over collected headers
+
+        Requires SQLite to be compiled with FTS5 which is the default for
+        most python distributions. If it is not available searching is
+        disabled and gathering continues as normal.
+
+        Args:
+            cursor (sqlite3.cursor): database cursor object
+
+        Returns:
+            True if the index exists, False otherwise
+        """
+        try:
+            cursor.execute("""
+                            CREATE VIRTUAL TABLE IF NOT EXISTS headers_fts
+                            USING fts5(
+                                hostname,
+                                ip,
+                                http_headers,
+                                https_headers,
+                                domain UNINDEXED
+                            )
+                            """)
+        except sqlite3.OperationalError:
+            self.logger.exception("FTS5 is not available, header search disabled")
+            return False
+        return True
+
+    def _update_search_index(self, dbconn):
+        """Replace the header search entries for the current domain with
+        the header data currently stored in the data table.
+
+        Args:
+            dbconn (sqlite3.Connection): connection from database.connect
+
+        Returns:
+        """
+        if not self._create_search_index(dbconn.cursor()):
+            return
+        domain_rep = self.domain.replace(".", "_")
+        with database.transaction(dbconn) as cursor:
+            cursor.execute("DELETE FROM headers_fts WHERE domain = ?", (domain_rep,))
+            cursor.execute("""INSERT INTO headers_fts
+                                (hostname, ip, http_headers, https_headers, domain)
+                                SELECT hostname, ip, http_headers, https_headers, domain
+                                FROM data
+                                WHERE domain = ?
+                                AND (http_headers IS NOT NULL
+                                OR https_headers IS NOT NULL)""",
+                           (domain_rep,))
+
+    def search_headers(self, query):
+        """Search the collected headers of the current domain
+
+        Args:
+            query (str): FTS5 query e.g. '"X-Powered-By" AND PHP' or 'nginx'
+
+        Returns:
+            A list of tuples (hostname, ip, matching snippet)
+        """
+        if not path.exists(self.dbfile):
+            print("No database file found. Exiting")
+            return []
+
+        dbconn = database.connect(self.dbfile)
+        try:
+            dbcurs = dbconn.cursor()
+            return dbcurs.execute("""SELECT hostname, ip,
+                                    snippet(headers_fts, -1, '[', ']', '...', 12)
+                                    FROM headers_fts
+                                    WHERE headers_fts MATCH ?
+                                    AND domain = ?
+                                    ORDER BY rank""",
+                                  (query, self.domain.replace('.', '_'))).fetchall()
+        except sqlite3.OperationalError as error:
+            print(f"[!] Header search failed: {error}")
+            self.logger.exception("Error in search_headers")
+            return []
+        finally:
+            dbconn.close()
+
     def headers(self):
         """Attempts to grab header data for all ips/hostnames
 
         Returns:
 
         """
-        dbconn = sqlite3.connect(self.dbfile)
+        dbconn = database.connect(self.dbfile)
         dbcurs = dbconn.cursor()
 
         print("[*] Grabbing headers from ips and hostnames")
@@ -343,17 +949,14 @@ class Aggregation:
         pool.join()
 
         print("Updating database with ip headers")
-        dbcurs.execute('BEGIN TRANSACTION')
         domain_rep = self.domain.replace(".", "_")
-        while not queue.empty():
-            ipv4, (http, https) = queue.get()
-            dbcurs.execute(f"""UPDATE data
-                                SET http_headers=?, https_headers=?
-                                WHERE ip = ?
-                                AND domain= ?
-                                """,
-                           (http, https, ipv4, domain_rep))
-        dbcurs.execute("COMMIT")
+        database.write_batches(dbconn,
+                               """UPDATE data
+                               SET http_headers=?, https_headers=?
+                               WHERE ip = ?
+                               AND domain= ?""",
+                               ((http, https, ipv4, domain_rep)
+                                for ipv4, (http, https) in self._drain(queue)))
 
         hostnames = dbcurs.execute(f"""SELECT hostname
                                 FROM data
@@ -371,16 +974,16 @@ class Aggregation:
         pool.join()
 
         print("Updating database with hostname headers")
-        dbcurs.execute('BEGIN TRANSACTION')
-        domain_rep = self.domain.replace(".", "_")
-        while not queue.empty():
-            hostname, (http, https) = queue.get()
-            dbcurs.execute(f"""UPDATE data
-                                SET http_headers=?, https_headers=?
-                                WHERE hostname = ?
-                                AND domain= ?;""",
-                           (http, https, hostname, domain_rep))
-        dbcurs.execute("COMMIT")
+        database.write_batches(dbconn,
+                               """UPDATE data
+                               SET http_headers=?, https_headers=?
+                               WHERE hostname = ?
+                               AND domain= ?""",
+                               ((http, https, hostname, domain_rep)
+                                for hostname, (http, https) in self._drain(queue)))
+
+        print("Updating header search index")
+        self._update_search_index(dbconn)
 
         dbconn.close()
 
@@ -395,7 +998,7 @@ class Aggregation:
             print("No database file found. Exiting")
             return None
 
-        dbconn = sqlite3.connect(self.dbfile)
+        dbconn = database.connect(self.dbfile)
         dbcurs = dbconn.cursor()
 
         db_headers = dbcurs.execute(f"""SELECT *
@@ -452,4 +1055,5 @@ class Aggregation:
                 }
             elif hostname not in file_index[ipv4]['hostnames']:
                 file_index[ipv4]['hostnames'] += [hostname]
+        dbconn.close()
         return file_index
@@ -12,14 +12,101 @@ Attributes:
     infile (str): Infile for playbook job
     verbose (bool): More output Yes/No
     final_command (str): Final command to run
+    argv (List): final_command split into arguments, run without a shell
+    name (str): name of the module, used for its log file
+    log_dir (str): directory for the playbook log, None for no log
+    tasks (List): dicts with name, host results and seconds of every finished task
+    tail (deque): last TAIL_LINES lines of playbook output
+    exit_code (int): exit code of ansible-playbook once it has exited
+    forks (int): parallel hosts of the play (--forks), None for the ansible default
+    timed_out (bool): If the play was stopped before it finished
+    shard (Dict): host and infile of the shard this play runs, None for the whole infile
+    provision (bool): pass the fingerprint of the playbook so provisioned hosts skip setup
+    TAIL_LINES (int): lines of output kept in memory
 """
+import hashlib
+import json
 import logging
+import os
+import re
+import shlex
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from string import Template
+from docker.utils import parse_bytes
+from robot_api.api.dockerize import CappedLog, LOG_MAX_BYTES
 from robot_api.parse import join_abs
 
 LOG = logging.getLogger(__name__)
 
+TAIL_LINES = 200
+TASK_RE = re.compile(r"^(?:TASK|RUNNING HANDLER) \[(.*)\]")
+RESULT_RE = re.compile(r"^(ok|changed|failed|fatal|skipping|unreachable): \[")
+END_RE = re.compile(r"^(?:PLAY \[|PLAY RECAP)")
+# Options making ansible-playbook ask for input, which a play without a terminal can not answer
+PROMPT_FLAGS = {"-k", "--ask-pass", "-K", "--ask-become-pass", "--ask-sudo-pass",
+                "--ask-su-pass", "-J", "--ask-vault-pass", "--ask-vault-password"}
+
+
+def inventory_hosts(inventory, group="all"):
+    """Hosts of group in an ansible inventory, in any format ansible reads
+
+    Args:
+        inventory (str): inventory file
+        group (str): group to list the hosts of, children included
+
+    Returns:
+        (List) host names
+
+    Raises:
+        OSError: ansible-inventory is not installed
+        subprocess.CalledProcessError: the inventory could not be parsed
+    """
+    listing = json.loads(subprocess.check_output(["ansible-inventory", "-i", inventory, "--list"],
+                                                 stderr=subprocess.DEVNULL,
+                                                 universal_newlines=True))
+    hosts = []
+    pending = [group]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        hosts += [host for host in listing.get(current, {}).get("hosts", []) if host not in hosts]
+        pending += listing.get(current, {}).get("children", [])
+    return hosts
+
+
+def shard_infile(infile, hosts, shard_dir):
+    """Split the lines of infile into one balanced shard per host
+
+    Lines are dealt out round robin so shard sizes differ by at most one.
+
+    Args:
+        infile (str): file with one target per line
+        hosts (List): hosts to create a shard for
+        shard_dir (str): directory the shard files are written to
+
+    Returns:
+        (Dict) host -> shard file, hosts without any line are left out
+    """
+    with open(infile, 'r') as _file:
+        targets = [line.strip() for line in _file if line.strip()]
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = {}
+    for index, host in enumerate(hosts):
+        lines = targets[index::len(hosts)]
+        if not lines:
+            continue
+        shards[host] = join_abs(shard_dir, f"{os.path.basename(infile)}.{host}")
+        with open(shards[host], 'w') as _file:
+            _file.write("\n".join(lines) + "\n")
+    return shards
+
 
 class Ansible:
     def __init__(self, **kwargs):
@@ -42,7 +129,13 @@ class Ansible:
                 },
                 "ansible_file_location" : "location",
                 "verbose" : True,
-                "domain" : "target.domain"
+                "domain" : "target.domain",
+                "name" : "HTTPScreenshot",
+                "forks" : 10,
+                "shard" : {"host": "worker1", "infile": "/path/to/shard"},
+                "provision" : True,
+                "log_dir" : "~/.drrobot/logs",
+                "log_max_bytes" : "1m"
             }
 
         Returns:
@@ -65,7 +158,23 @@ class Ansible:
             self.infile = join_abs(self.output_dir, "aggregated", "aggregated_protocol_hostnames.txt")
 
         self.verbose = kwargs.get('verbose', False)
+        self.name = kwargs.get('name', None) or "ansible"
+        self.log_dir = kwargs.get('log_dir', None)
+        self.log_max_bytes = kwargs.get('log_max_bytes', None)
+        self.forks = self.ansible_arguments.get('forks', None) or kwargs.get('forks', None)
         self.final_command = None
+        self.argv = None
+        self.process = None
+        self.exit_code = None
+        self.timed_out = False
+        self.shard = kwargs.get('shard', None)
+        self.provision = kwargs.get('provision', True)
+        self.tasks = []
+        self.tail = deque(maxlen=TAIL_LINES)
+        self._task = None
+        self._log = None
+        self._stopped = False
+        self._process_lock = threading.Lock()
 
     def _print(self, msg):
         """Utility for logging
@@ -118,14 +227,124 @@ class Ansible:
 
             _temp = Template(self.ansible_base)
             self.final_command = _temp.safe_substitute(substitutes)
+            if self.forks:
+                self.final_command += f" --forks {int(self.forks)}"
+            if self.provision:
+                fingerprint = self.fingerprint(config.safe_substitute(system_replacements))
+                if fingerprint:
+                    self.final_command += f" -e provision_fingerprint={fingerprint}"
+            if self.shard:
+                self.final_command += " " + " ".join(
+                    f"-e {shlex.quote(f'{key}={value}')}"
+                    for key, value in self._shard_vars(extra_replace_string).items())
+            # No shell runs the command, expand ~ like it would
+            self.argv = [os.path.expanduser(arg) if arg.startswith("~") else arg
+                         for arg in shlex.split(self.final_command)]
 
             self._print(f"Final ansible command {self.final_command}")
         except BaseException:
             raise TypeError("NoneType object supplied in Dict build")
+        prompt = self.prompt_flag(self.argv)
+        if prompt:
+            raise ValueError(f"{self.name} asks for input with {prompt} but plays run without "
+                             "a terminal. Put the password in the inventory or a vault password file")
+
+    @staticmethod
+    def prompt_flag(argv):
+        """First argument of argv that makes ansible-playbook prompt, None if there is none
+
+        Covers the --ask-* options, short option clusters such as -kK and
+        --vault-id @prompt. vars_prompt in a playbook can not be detected.
+        """
+        for arg in argv or []:
+            if arg in PROMPT_FLAGS or arg.startswith("--ask-") or arg.endswith("@prompt"):
+                return arg
+            if re.match(r"^-[a-zA-Z]+$", arg) and set(arg[1:]) & {"k", "K", "J"}:
+                return arg
+        return None
+
+    @staticmethod
+    def fingerprint(playbook):
+        """Short sha256 of the playbook file, None if it can not be read
+
+        Plays compare it against the marker left on a host by its last
+        provisioning and skip their install tasks when it matches. Any
+        change to the playbook provisions every host again.
+        """
+        try:
+            with open(playbook, 'rb') as _file:
+                return hashlib.sha256(_file.read()).hexdigest()[:16]
+        except OSError:
+            LOG.debug("Could not fingerprint %s", playbook, exc_info=True)
+            return None
+
+    def _shard_vars(self, extra):
+        """Extra vars overriding host, infile and outputs of the play for its shard
+
+        Every shard syncs into a subfolder of outfolder named after its
+        host, plays fetching a tarball get their own outfile.
+        """
+        values = dict(token.split("=", 1) for token in shlex.split(extra) if "=" in token)
+        host = self.shard['host']
+        overrides = {"variable_host": host, "infile": self.shard['infile']}
+        if values.get("outfile"):
+            root, ext = os.path.splitext(values["outfile"])
+            overrides["outfile"] = f"{root}_{host}{ext}"
+        if values.get("outfolder"):
+            overrides["outfolder"] = join_abs(values["outfolder"], host)
+        return overrides
+
+    @property
+    def inventory(self):
+        """Inventory passed with -i/--inventory, None if the flags have none"""
+        for flag, value in zip(self.argv or [], (self.argv or [])[1:]):
+            if flag in ("-i", "--inventory", "--inventory-file"):
+                return value
+        return None
+
+    @property
+    def log_file(self):
+        """Path of the playbook log, None without log_dir"""
+        if self.log_dir is None:
+            return None
+        suffix = f"_{self.shard['host']}" if self.shard else ""
+        return join_abs(self.log_dir, f"ansible_{self.name.lower()}{suffix}.log")
+
+    def _end_task(self, now):
+        """Record the running task as finished at now"""
+        if self._task is None:
+            return
+        self._task['seconds'] = now - self._task.pop('started')
+        self.tasks += [self._task]
+        results = ", ".join(f"{result}={count}" for result, count in self._task['results'].items())
+        summary = (f"{self.name} task {self._task['name']} took " +
+                   f"{self._task['seconds']:.1f}s ({results or 'no hosts'})")
+        if self._log is not None:
+            self._log.write(f"[drrobot] {summary}\n")
+        self._print(summary)
+        self._task = None
+
+    def _track(self, line):
+        """Follow task starts and host results in a line of playbook output"""
+        now = time.monotonic()
+        task = TASK_RE.match(line)
+        if task or END_RE.match(line):
+            self._end_task(now)
+        if task:
+            self._task = {'name': task.group(1), 'results': {}, 'started': now}
+            return
+        result = RESULT_RE.match(line)
+        if result and self._task is not None:
+            results = self._task['results']
+            results[result.group(1)] = results.get(result.group(1), 0) + 1
 
     def run(self):
         """Run the final command built at runtime
 
+        The output of ansible-playbook is read line by line. It is written to
+        the size capped playbook log, task timings are tracked as the tasks
+        finish and only the last TAIL_LINES lines are kept in memory.
+
         Args:
 
         Returns:
@@ -133,14 +352,38 @@ class Ansible:
         """
         try:
             self.build()
-            _ = subprocess.check_output(
-                self.final_command,
-                shell=True,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True)
-        except subprocess.CalledProcessError:
-            print(f"[!] CallProcessError check logs")
-            LOG.exception("Called Process Error Ansible")
+            if self.log_file is not None:
+                self._log = CappedLog(self.log_file,
+                                      parse_bytes(self.log_max_bytes or LOG_MAX_BYTES))
+            env = dict(os.environ, ANSIBLE_NOCOLOR="1", ANSIBLE_FORCE_COLOR="0",
+                       PYTHONUNBUFFERED="1")
+            # A stop during build must not be followed by a start
+            with self._process_lock:
+                if self._stopped:
+                    self._print(f"{self.name} was stopped before it started")
+                    return
+                self.process = subprocess.Popen(self.argv,
+                                                stdout=subprocess.PIPE,
+                                                stderr=subprocess.STDOUT,
+                                                stdin=subprocess.DEVNULL,
+                                                env=env,
+                                                universal_newlines=True,
+                                                errors="replace")
+            for line in self.process.stdout:
+                # Tracked first so a task summary precedes the next task
+                self._track(line.rstrip("\n"))
+                if self._log is not None:
+                    self._log.write(line)
+                self.tail.append(line.rstrip("\n"))
+            self.exit_code = self.process.wait()
+            self._end_task(time.monotonic())
+            if self.exit_code:
+                raise subprocess.CalledProcessError(self.exit_code, self.argv,
+                                                    output="\n".join(self.tail))
+        except subprocess.CalledProcessError as error:
+            print(f"[!] {self.name} playbook exited with {error.returncode}, " +
+                  (f"see {self.log_file}" if self.log_file else "check logs"))
+            LOG.error("Ansible %s failed, last output:\n%s", self.name, error.output)
         except OSError:
             print(f"[!] OSError check logs")
             LOG.exception("OSError in Ansible")
@@ -150,3 +393,114 @@ class Ansible:
         except TypeError:
             print(f"[!] TypeError check logs")
             LOG.exception("Type Error in Ansible")
+        except ValueError as error:
+            print(f"[!] {error}")
+            LOG.error("Ansible %s not started: %s", self.name, error)
+        finally:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def stop(self, grace=10):
+        """Sends SIGTERM and kills ansible-playbook if it is still running after grace seconds
+
+        A play that has not started yet will not start anymore.
+
+        Args:
+            grace (int): seconds to wait before killing
+
+        """
+        with self._process_lock:
+            self._stopped = True
+            process = self.process
+        if process is None:
+            self.timed_out = True
+            return
+        if process.poll() is not None:
+            return
+        self.timed_out = True
+        process.terminate()
+        try:
+            process.wait(grace)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class AnsibleExecutor(threading.Thread):
+    """Runs ansible plays with at most max_plays at once
+
+    Plays marked exclusive (run_as_thread off) never run at the same time
+    as other exclusive plays, they still share the max_plays slots with
+    the other plays. The shards of an exclusive play share its name and
+    run at once. No play can prompt: stdin is /dev/null and the output goes to
+    the log, so become passwords and the like must come from the inventory
+    or a vault file.
+
+    The thread finishes once every play has exited, so it can be joined
+    like the other scanner threads.
+    """
+    def __init__(self, plays, max_plays=2, stop_grace=10):
+        """
+        Args:
+            plays (List): tuples (Ansible, exclusive) of built plays
+            max_plays (int): plays running at once
+            stop_grace (int): seconds between SIGTERM and SIGKILL on stop
+
+        Returns:
+
+        """
+        super().__init__(daemon=True)
+        self.plays = plays
+        self.max_plays = max(int(max_plays or 1), 1)
+        self.stop_grace = stop_grace
+        self._stopped = threading.Event()
+        self._exclusive = threading.Condition()
+        # Name of the exclusive play running and how many of its shards run
+        self._exclusive_name = None
+        self._exclusive_count = 0
+
+    def _acquire_exclusive(self, name):
+        with self._exclusive:
+            while self._exclusive_name not in (None, name):
+                self._exclusive.wait()
+            self._exclusive_name = name
+            self._exclusive_count += 1
+
+    def _release_exclusive(self):
+        with self._exclusive:
+            self._exclusive_count -= 1
+            if not self._exclusive_count:
+                self._exclusive_name = None
+                self._exclusive.notify_all()
+
+    def _run_play(self, play, exclusive):
+        if not exclusive:
+            if not self._stopped.is_set():
+                play.run()
+            return
+        self._acquire_exclusive(play.name)
+        try:
+            if not self._stopped.is_set():
+                play.run()
+        finally:
+            self._release_exclusive()
+
+    def stop(self):
+        """Stop every running play and start no new ones
+        """
+        self._stopped.set()
+        for play, _ in self.plays:
+            play.stop(self.stop_grace)
+
+    def run(self):
+        # Automated plays are queued first so they are not stuck behind exclusive ones
+        # Shards of an exclusive play are queued together
+        ordered = sorted(self.plays, key=lambda play: (play[1], play[0].name if play[1] else ""))
+        with ThreadPoolExecutor(max_workers=self.max_plays) as pool:
+            futures = {pool.submit(self._run_play, play, exclusive): play
+                       for play, exclusive in ordered}
+        for future, play in futures.items():
+            error = future.exception()
+            if error is not None:
+                print(f"[!] Error running {play.name}. Check logs")
+                LOG.error("Ansible %s failed", play.name, exc_info=error)
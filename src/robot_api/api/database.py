@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Database Module
+
+Connection management for the sqlite3 database. A single database file is
+shared by every domain, so multiple Dr.ROBOT processes may be reading and
+writing to it at the same time.
+
+Every connection is opened in WAL mode with a busy timeout, and writes are
+grouped into short IMMEDIATE transactions so that no process holds the write
+lock for longer than a single batch.
+
+Attributes:
+    BUSY_TIMEOUT (int): seconds to wait on a locked database before failing
+    BATCH_SIZE (int): number of rows written per transaction
+"""
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+LOG = logging.getLogger(__name__)
+
+BUSY_TIMEOUT = 60
+BATCH_SIZE = 500
+
+
+def connect(dbfile, timeout=BUSY_TIMEOUT):
+    """Open a connection configured for concurrent access
+
+    The connection is in autocommit mode, transactions must be started
+    explicitly with :func:`transaction`.
+
+    Args:
+        dbfile (str): path to the sqlite3 database file
+        timeout (int): seconds to wait for a lock before raising
+
+    Returns:
+        sqlite3.Connection
+    """
+    conn = sqlite3.connect(dbfile, timeout=timeout, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=1")
+    return conn
+
+
+@contextmanager
+def connection(dbfile, timeout=BUSY_TIMEOUT):
+    """Context manager yielding a connection from :func:`connect`
+    that is always closed on exit.
+
+    Args:
+        dbfile (str): path to the sqlite3 database file
+        timeout (int): seconds to wait for a lock before raising
+
+    Yields:
+        sqlite3.Connection
+    """
+    conn = connect(dbfile, timeout)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(conn):
+    """Run the enclosed statements in a single write transaction
+
+    BEGIN IMMEDIATE takes the write lock up front so concurrent writers wait
+    on the busy timeout instead of failing when upgrading a read lock.
+
+    Args:
+        conn (sqlite3.Connection): connection from :func:`connect`
+
+    Yields:
+        sqlite3.Cursor
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+
+
+def _log_row(row, error):
+    LOG.error("Could not write %s: %s", row, error)
+
+
+def _write_rows(conn, statement, batch, on_error):
+    """Write batch one row at a time, reporting the rows that fail
+
+    Returns:
+        (int) number of rows changed
+    """
+    changes = conn.total_changes
+    try:
+        with transaction(conn) as cursor:
+            for row in batch:
+                try:
+                    cursor.execute(statement, row)
+                except sqlite3.Error as error:
+                    on_error(row, error)
+    except sqlite3.Error as error:
+        # The transaction itself failed, e.g. the database stayed locked
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        for row in batch:
+            on_error(row, error)
+        return 0
+    return conn.total_changes - changes
+
+
+def _write_batch(conn, statement, batch, on_error):
+    """Write batch in one transaction, row by row if that fails
+
+    Returns:
+        (int) number of rows changed
+    """
+    changes = conn.total_changes
+    try:
+        with transaction(conn) as cursor:
+            cursor.executemany(statement, batch)
+        return conn.total_changes - changes
+    except sqlite3.Error:
+        LOG.warning("Batch of %d rows failed, retrying row by row", len(batch), exc_info=True)
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return _write_rows(conn, statement, batch, on_error)
+
+
+def write_batches(conn, statement, rows, batch_size=BATCH_SIZE, on_error=_log_row):
+    """Execute statement for every row, committing every batch_size rows
+
+    A batch that fails is retried row by row, so a single bad row or a
+    locked batch does not lose the other rows. Rows that still fail are
+    passed to on_error.
+
+    Args:
+        conn (sqlite3.Connection): connection from :func:`connect`
+        statement (str): parameterized SQL statement
+        rows (Iterable): parameters for each execution of statement
+        batch_size (int): rows per transaction
+        on_error (callable): called with the row and the sqlite3.Error of every row not written
+
+    Returns:
+        (int) number of rows changed, rows ignored by INSERT OR IGNORE are not counted
+    """
+    written = 0
+    batch = []
+    for row in rows:
+        batch += [row]
+        if len(batch) >= batch_size:
+            written += _write_batch(conn, statement, batch, on_error)
+            batch = []
+    if batch:
+        written += _write_batch(conn, statement, batch, on_error)
+    LOG.debug("Wrote %d rows in batches of %d", written, batch_size)
+    return written
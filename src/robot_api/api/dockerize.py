@@ -10,23 +10,179 @@ Attributes:
     verbose (bool): More output Yes/No
     container (docker.Container): container object when running
     status (str): If running or not
+    exit_code (int): exit code of the container once it has exited
+    cpus (float): cpu limit of the container from the "resources" hint
+    timeout (int): seconds the container may run before it is stopped
+    timed_out (bool): If the container was stopped for running too long
+    build_seconds (float): time spent building (or finding a cached) image
+    started (float): epoch time the container was started
+    stopped (float): epoch time the container exit was reported
+    memory (str): memory limit of the container from the "resources" hint
+    finished (threading.Event): set once the container exited or failed to start
+    watcher (ContainerWatcher): watcher the container is registered with before it starts
     name (str): name of docker image
+    remote (bool): If the container runs on a remote daemon and its output is copied back
+    host_volumes (bool): If the scanner mounts its own "volumes" from this host
+    base (BaseImage): shared base image the template is built FROM, if any
+    parameterized (bool): If $target is passed as TARGET at run time instead of build time
+    warm (bool): If the scanner runs in a long lived worker container of the pool
+    build_step (tuple): (step, steps) of the running build, None before the first step
+    log_bytes (int): bytes of output the container wrote to its log so far
+    progress (callable): called with the scanner when build_step or log_bytes moved
+    stats_interval (float): seconds between resource samples, 0 for none
+    samples (List): (time, cpu_percent, rss_bytes, net_rx_bytes, net_tx_bytes,
+        block_read_bytes, block_write_bytes) tuples sampled while running
+    CONTEXT_LABEL (str): image label holding the hash of the build context
+    WORKER_LABEL (str): container label holding the image tag of a pool worker
+    MAX_POOL_SIZE (int): default number of connections kept open to the daemon
+    LOG_MAX_BYTES (int): default size cap of every build/run log file
 """
-from os.path import isfile, basename
+from collections import deque
+from os import environ, walk, makedirs, listdir
+from os.path import isfile, isdir, relpath, getsize, normpath, isabs, dirname
 from string import Template
+import fcntl
+import gzip
+import hashlib
+import inspect
+import io
 import logging
-import time
+import re
+import shlex
 import tarfile
+import tempfile
+import threading
+import time
 import json
-import multiprocessing
 from tqdm import tqdm
 import docker
 from docker.errors import APIError, BuildError, ContainerError, ImageNotFound, NotFound
+from docker.utils import parse_bytes
 
 from robot_api.parse import join_abs
 
 LOG = logging.getLogger(__name__)
 
+CONTEXT_LABEL = "drrobot.context_hash"
+WORKER_LABEL = "drrobot.worker"
+# Keeps a pool worker running until it is given a job through exec
+WORKER_COMMAND = ["/bin/sh", "-c", "while :; do sleep 3600; done"]
+MAX_POOL_SIZE = 20
+LOG_MAX_BYTES = 1024 * 1024
+# Lines of build output kept in memory for the BuildError of a failed build
+BUILD_ERROR_LINES = 50
+# Seconds between progress reports while a container writes output
+PROGRESS_INTERVAL = 1
+STEP_RE = re.compile(r"^Step (\d+)/(\d+)")
+
+_CLIENTS = {}
+_CLIENT_LOCK = threading.Lock()
+# max_pool_size was added in docker 4.2, older clients use the default pool
+_POOL_SIZE_SUPPORTED = "max_pool_size" in inspect.signature(docker.APIClient.__init__).parameters
+
+
+def get_client(max_pool_size=None, base_url=None, tls=False):
+    """Docker client shared by every scanner and watcher of this process
+
+    One client is created per daemon on first use, every later call
+    returns the same client and with it the same connection pool.
+    Long running requests such as the events stream hold on to a connection
+    of the pool, so max_pool_size should exceed the number of containers
+    running at once.
+
+    Args:
+        max_pool_size (int): connections kept open to the daemon,
+            only used when the client is first created
+        base_url (str): daemon to connect to, None for the one from the environment
+        tls (bool/docker.tls.TLSConfig): TLS settings for base_url
+
+    Returns:
+        docker.DockerClient
+    """
+    with _CLIENT_LOCK:
+        if base_url not in _CLIENTS:
+            pool_size = max_pool_size or MAX_POOL_SIZE
+            pool = {"max_pool_size": pool_size} if _POOL_SIZE_SUPPORTED else {}
+            if base_url is None:
+                _CLIENTS[base_url] = docker.from_env(**pool)
+            else:
+                _CLIENTS[base_url] = docker.DockerClient(base_url=base_url,
+                                                         tls=tls,
+                                                         **pool)
+            if pool:
+                LOG.debug("Created docker client for %s with a pool of %d connections",
+                          base_url or "local daemon", pool_size)
+            else:
+                LOG.warning("docker %s does not support max_pool_size, update to 4.2 or newer",
+                            docker.__version__)
+        return _CLIENTS[base_url]
+
+
+def is_local_url(base_url):
+    """True if the daemon at base_url is on this host (unix socket or named pipe)
+
+    Decided on the configured url, docker-py rewrites unix:// and ssh://
+    alike to http+docker:// urls.
+
+    Args:
+        base_url (str): url as given to get_client, None for DOCKER_HOST
+
+    Returns:
+        bool
+    """
+    if base_url is None:
+        base_url = environ.get("DOCKER_HOST")
+    return not base_url or base_url.startswith(("unix://", "npipe://"))
+
+
+def is_local_client(client):
+    """True if client was created by get_client for a daemon on this host"""
+    with _CLIENT_LOCK:
+        base_urls = [base_url for base_url, known in _CLIENTS.items() if known is client]
+    return is_local_url(base_urls[0] if base_urls else None)
+
+
+class CappedLog:
+    """Log file holding at most max_bytes of what is written to it
+
+    The head of the output is written straight to the file. Once the cap
+    is reached only the last quarter of the cap is kept in memory and
+    appended on close, after a marker with the number of dropped bytes.
+    Errors usually end up at the tail, the head shows what was started.
+
+    Attributes:
+        path (str): file the log is written to
+        written (int): bytes passed to write so far
+    """
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES):
+        self.path = path
+        self.written = 0
+        self._tail_bytes = max_bytes // 4
+        self._head_bytes = max_bytes - self._tail_bytes
+        self._tail = bytearray()
+        makedirs(dirname(path), exist_ok=True)
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        """Append data (bytes or str) to the log"""
+        if isinstance(data, str):
+            data = data.encode(errors="replace")
+        head = max(self._head_bytes - self.written, 0)
+        if head:
+            self._file.write(data[:head])
+            self._file.flush()
+        self._tail += data[head:]
+        if len(self._tail) > self._tail_bytes:
+            del self._tail[:len(self._tail) - self._tail_bytes]
+        self.written += len(data)
+
+    def close(self):
+        dropped = self.written - self._head_bytes - len(self._tail)
+        if dropped > 0:
+            self._file.write(f"\n[... {dropped} bytes dropped ...]\n".encode())
+        self._file.write(self._tail)
+        self._file.close()
+
 
 class Docker:
     def __init__(self, **kwargs):
@@ -38,6 +194,15 @@ class Docker:
                 active_config_path: (String) filepath of config to use for "active" configuration
                 default_config_path: (String) filepath of config to use as default template.
                 output_dir: (String) output directory to mount on docker
+                client: (docker.DockerClient) client to use, defaults to the shared client
+                remote: (bool) daemon can not mount output_dir, copy the output back instead
+                base: (BaseImage) shared base image substituted for $base_image
+                parameterized: (bool) pass $target as the TARGET env var at run time
+                warm: (bool) run in a pooled worker container instead of a new container
+                lock_dir: (String) directory for the worker claim locks
+                log_dir: (String) directory for the build and run logs, None for no logs
+                log_max_bytes: (int/str) size cap of every log file
+                stats_interval: (float) seconds between resource samples, 0 for none
 
         Returns:
 
@@ -48,16 +213,55 @@ class Docker:
         self._active_config_path = kwargs.get('active_config_path', None)
         self.name = self._docker_options['name']
         self.network_mode = self._docker_options.get('network_mode', 'host')
+        resources = self._docker_options.get('resources') or {}
+        self.cpus = resources.get('cpus', None)
+        self.memory = resources.get('memory', None)
+        self.timeout = self._docker_options.get('timeout', None)
+        self.timed_out = False
+        self.build_seconds = None
+        self.started = None
+        self.stopped = None
 
         self.verbose = kwargs.get('verbose', False)
-        self.client = docker.from_env()
+        self._client = kwargs.get('client', None)
+        self.remote = kwargs.get('remote', False)
+        self.host_volumes = self._docker_options.get('volumes', None) is not None
+        self.base = kwargs.get('base', None)
+        if self.base is not None:
+            self._docker_options['base_image'] = self.base.tag
+        self.parameterized = kwargs.get('parameterized', False)
+        self.warm = kwargs.get('warm', False) and self.parameterized
+        self.lock_dir = kwargs.get('lock_dir', None) or tempfile.gettempdir()
+        self._worker_lock = None
+        self.log_dir = kwargs.get('log_dir', None)
+        self.log_max_bytes = parse_bytes(kwargs.get('log_max_bytes', None) or LOG_MAX_BYTES)
+        self.build_step = None
+        self.log_bytes = 0
+        self.progress = None
+        self._reported = 0
+        self.stats_interval = kwargs.get('stats_interval', 0)
+        self.samples = []
         self.image = None
         self.container = None
         self.status = None
+        self.exit_code = None
+        self.finished = threading.Event()
+        self.watcher = None
         self.error = False
         self.done_building = False
         self.OUTPUT_DIR = kwargs.get('output_dir', None)
 
+    @property
+    def client(self):
+        """Client of the daemon the scanner is placed on, the shared local client by default"""
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
     def _print(self, msg):
         if self.verbose:
             print("[D] " + msg)
@@ -66,16 +270,48 @@ class Docker:
     def kill(self):
         """Kills container
 
-        Tries to kill container.
+        Tries to kill container. Containers on remote daemons and pool
+        workers are not removed automatically so they are force removed instead.
 
         """
+        if self.container is None:
+            return
         try:
-            self.container.kill()
+            if self.remote or self.warm:
+                self.container.remove(force=True)
+            else:
+                self.container.kill()
+        except NotFound:
+            pass
         except docker.errors.APIError:
             self._print(
                 "Error when trying to send kill signal to docker container.")
             LOG.exception("Killing container")
 
+    def stop(self, grace=10):
+        """Stops container
+
+        Sends SIGTERM so the tool can flush its output and kills
+        the container if it is still running after grace seconds.
+        Anything already written to the output folder is kept.
+        A stopped pool worker is removed once its output is copied back.
+
+        Args:
+            grace (int): seconds to wait before killing the container
+
+        """
+        if self.container is None:
+            return
+        try:
+            self.container.stop(timeout=grace)
+        except NotFound:
+            # Already exited and removed
+            pass
+        except docker.errors.APIError:
+            self._print(
+                "Error when trying to stop docker container.")
+            LOG.exception("Stopping container")
+
     def gen_config(self):
         """Creates active configuration from template
 
@@ -90,21 +326,82 @@ class Docker:
 
         self._print(f"Making config with args:{json.dumps(self._docker_options, indent=4)}")
 
+        replacements = {k: v if v else '\'\''
+                        for k, v in self._docker_options.items()}
+        if self.parameterized:
+            # Resolved by the shell at run time so one image serves every domain
+            replacements['target'] = '${TARGET}'
+
         with open(self._default_config_path, 'r') as cfg:
             t = Template(cfg.read())
         with open(self._active_config_path, 'w') as out:
-            out.write(t.safe_substitute({k: v if
-                                         v else '\'\''
-                                         for k, v
-                                         in self._docker_options.items()
-                                         }))
-    def gen_tarfile(self):
-        tarname = join_abs(self._docker_options['tarfiles'], basename(self._active_config_path) + ".tar.gz")
-        with tarfile.open(name=tarname, mode="w:gz") as tar:
-            tar.add(self._active_config_path, "Dockerfile")
-            tar.add(self._docker_options['certs'], 'certs')
-        return tarname
-            
+            out.write(t.safe_substitute(replacements))
+    @staticmethod
+    def _add_bytes(tar, name, data, mode=0o644):
+        """Add data to tar as name with fixed metadata so that the
+        same input always produces the same archive.
+        """
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = mode
+        info.mtime = 0
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        tar.addfile(info, io.BytesIO(data))
+
+    def gen_context(self):
+        """Build the docker build context in memory
+
+        The context holds the rendered Dockerfile and the certs directory.
+        Entries are added in sorted order with zeroed mtimes and owners so
+        unchanged inputs always produce byte identical contexts.
+
+        Returns:
+            (bytes) uncompressed tar archive
+        """
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w", format=tarfile.PAX_FORMAT) as tar:
+            with open(self._active_config_path, 'rb') as _file:
+                self._add_bytes(tar, "Dockerfile", _file.read())
+            certs = self._docker_options['certs']
+            if isdir(certs):
+                for root, dirs, files in walk(certs):
+                    dirs.sort()
+                    rel_root = relpath(root, certs)
+                    arc_root = "certs" if rel_root == "." else f"certs/{rel_root}"
+                    info = tarfile.TarInfo(arc_root)
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    info.mtime = 0
+                    tar.addfile(info)
+                    for name in sorted(files):
+                        with open(join_abs(root, name), 'rb') as _file:
+                            self._add_bytes(tar, f"{arc_root}/{name}", _file.read())
+        return buf.getvalue()
+
+    def _is_remote(self):
+        """True if the docker daemon is reached over the network
+        rather than a local unix socket or named pipe.
+        """
+        return not is_local_client(self.client)
+
+    def _cached_image(self, tag, context_hash):
+        """Look up an existing image built from the same context
+
+        Args:
+            tag (str): image tag to look up
+            context_hash (str): sha256 of the build context
+
+        Returns:
+            docker.Image if an up to date image exists, None otherwise
+        """
+        try:
+            image = self.client.images.get(tag)
+        except ImageNotFound:
+            return None
+        if image.labels.get(CONTEXT_LABEL) != context_hash:
+            return None
+        return image
 
     def build(self):
         """
@@ -115,32 +412,59 @@ class Docker:
         Returns:
 
         """
+        build_start = time.monotonic()
         try:
+            base_id = ""
+            if self.base is not None:
+                base_image = self.base.get(self.client)
+                if base_image is None:
+                    print(f"[!] Base image {self.base.name} of {self.name} failed to build. Check logs")
+                    self.error = True
+                    return
+                # A rebuilt base must invalidate every image built FROM it
+                base_id = base_image.id
             self.gen_config()
-            tarfile = self.gen_tarfile() 
+            tag = f"{self._docker_options['docker_name']}:{self._docker_options['docker_name']}"
+            context = self.gen_context()
+            context_hash = hashlib.sha256(context + base_id.encode()).hexdigest()
+            self.image = self._cached_image(tag, context_hash)
+            if self.image is not None:
+                self._print(f"Image {tag} is up to date, skipping build")
+                self.done_building = True
+                return
+
+            encoding = None
+            if self._is_remote():
+                # Only worth the CPU when the context leaves this machine
+                context = gzip.compress(context, mtime=0)
+                encoding = 'gzip'
             self._print(f"""Built with options:
                             -f {self._active_config_path}
                             -t {self._docker_options['docker_name']}:{self._docker_options['docker_name']}
                             --rm
                             --network {self.network_mode}
                         """)
-            with open(tarfile, 'rb') as _file:
-                self.image = self.client.images.build(fileobj=_file, 
-                                                 tag=f"{self._docker_options['docker_name']}:{self._docker_options['docker_name']}",
-                                                 custom_context=True,
-                                                 encoding='gzip',
-                                                 rm=True,
-                                                 network_mode=self.network_mode,
-                                                 use_config_proxy=True)
+            stream = self.client.api.build(fileobj=io.BytesIO(context),
+                                           tag=tag,
+                                           labels={CONTEXT_LABEL: context_hash},
+                                           custom_context=True,
+                                           encoding=encoding,
+                                           rm=True,
+                                           network_mode=self.network_mode,
+                                           use_config_proxy=True,
+                                           decode=True)
+            image_id = self._follow_build(stream)
+            self.image = self.client.images.get(image_id or tag)
 
             self.done_building = True
         except BuildError as error:
-            # print(f"[!] Build Error {self.name}. Check logs")
+            print(f"[!] Build Error {self.name}: {error.msg}" +
+                  (f", see {self._log_path('build')}" if self.log_dir else ""))
             LOG.exception("[!] BuildError: %s", self.name)
             self.error = True
-            # if "net/http" in str(error):
-                # print("[!] This could be a proxy issue, see " +
-                      # "https://docs.docker.com/config/daemon/systemd/#httphttps-proxy for help")
+            if "net/http" in str(error):
+                print("[!] This could be a proxy issue, see " +
+                      "https://docs.docker.com/config/daemon/systemd/#httphttps-proxy for help")
         except APIError:
             # print(f"[!] APIError: {self.name}")
             LOG.exception("[!] APIError: %s", self.name)
@@ -155,6 +479,187 @@ class Docker:
             LOG.exception("[!] Output directory could not be created, " +
                           "please verify permissions")
             self.error = True
+        finally:
+            self.build_seconds = time.monotonic() - build_start
+
+    def _log_path(self, phase):
+        suffix = "_build" if phase == "build" else ""
+        return join_abs(self.log_dir, f"docker_{self.name.lower()}{suffix}.log")
+
+    def _open_log(self, phase):
+        """CappedLog for the build or run phase, None without log_dir"""
+        if self.log_dir is None:
+            return None
+        return CappedLog(self._log_path(phase), self.log_max_bytes)
+
+    def _report(self, force=False):
+        """Call progress, at most every PROGRESS_INTERVAL seconds unless forced"""
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if force or now - self._reported >= PROGRESS_INTERVAL:
+            self._reported = now
+            self.progress(self)
+
+    def _follow_build(self, stream):
+        """Write the decoded build stream to the build log and track the step
+
+        Args:
+            stream (generator): decoded output of APIClient.build
+
+        Returns:
+            (str) id of the built image, None if the daemon did not report it
+
+        Raises:
+            BuildError: the daemon reported an error
+        """
+        image_id = None
+        recent = deque(maxlen=BUILD_ERROR_LINES)
+        log = self._open_log("build")
+        try:
+            for entry in stream:
+                if log is not None:
+                    log.write(entry.get("stream") or
+                              (entry["status"] + "\n" if "status" in entry else ""))
+                recent.append(entry)
+                if "error" in entry:
+                    if log is not None:
+                        log.write(entry["error"] + "\n")
+                    raise BuildError(entry["error"], list(recent))
+                match = STEP_RE.match(entry.get("stream", ""))
+                if match:
+                    self.build_step = (int(match.group(1)), int(match.group(2)))
+                    self._print(f"{self.name} build step {self.build_step[0]}/{self.build_step[1]}")
+                    self._report(force=True)
+                image_id = entry.get("aux", {}).get("ID", image_id)
+        finally:
+            if log is not None:
+                log.close()
+        return image_id
+
+    def _follow_logs(self, stream):
+        """Write the output of the container to the run log until it exits"""
+        log = self._open_log("run")
+        try:
+            for chunk in stream:
+                if log is not None:
+                    log.write(chunk)
+                self.log_bytes += len(chunk)
+                self._report()
+        except (NotFound, APIError, OSError):
+            # The container is gone, nothing more to read
+            LOG.debug("Log stream of %s ended", self.name, exc_info=True)
+        finally:
+            if log is not None:
+                log.close()
+            self._report(force=True)
+
+    def _start_log_follower(self):
+        """Stream the logs of the started container in the background"""
+        try:
+            stream = self.container.logs(stream=True, follow=True)
+        except (NotFound, APIError):
+            # auto_remove may have removed a short lived container already
+            LOG.debug("No logs for %s", self.name, exc_info=True)
+            return
+        threading.Thread(target=self._follow_logs, args=(stream,), daemon=True).start()
+
+    def _sample_stats(self):
+        """Keep a resource sample every stats_interval seconds until the container exits
+
+        The stats stream reports about once a second, samples in between
+        are skipped. Pool workers keep running, so sampling stops once
+        the job has finished.
+        """
+        last = 0
+        try:
+            for stats in self.client.api.stats(self.container.id, decode=True, stream=True):
+                if self.finished.is_set():
+                    break
+                now = time.monotonic()
+                if now - last < self.stats_interval:
+                    continue
+                last = now
+                sample = self._parse_stats(stats)
+                if sample is not None:
+                    self.samples += [sample]
+        except (NotFound, APIError, OSError):
+            LOG.debug("Stats stream of %s ended", self.name, exc_info=True)
+
+    @staticmethod
+    def _parse_stats(stats):
+        """Resource sample from a decoded stats entry, None for a stopped container
+
+        cpu_percent is relative to a single cpu like `docker stats`. Network
+        counters are None for containers sharing the host network.
+        """
+        memory = stats.get("memory_stats") or {}
+        if not memory:
+            return None
+        cpu = stats.get("cpu_stats") or {}
+        precpu = stats.get("precpu_stats") or {}
+        cpu_delta = (cpu.get("cpu_usage", {}).get("total_usage", 0) -
+                     precpu.get("cpu_usage", {}).get("total_usage", 0))
+        system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+        online = (cpu.get("online_cpus") or
+                  len(cpu.get("cpu_usage", {}).get("percpu_usage") or []) or 1)
+        cpu_percent = 0.0
+        if system_delta > 0 and cpu_delta > 0:
+            cpu_percent = cpu_delta / system_delta * online * 100
+
+        # cgroup v1 reports rss, v2 anon. Fall back to usage minus page cache
+        memory_stats = memory.get("stats") or {}
+        rss = memory_stats.get("rss", memory_stats.get("anon"))
+        if rss is None:
+            rss = memory.get("usage", 0) - memory_stats.get("inactive_file",
+                                                            memory_stats.get("total_inactive_file", 0))
+
+        networks = stats.get("networks")
+        net_rx = net_tx = None
+        if networks:
+            net_rx = sum(net.get("rx_bytes", 0) for net in networks.values())
+            net_tx = sum(net.get("tx_bytes", 0) for net in networks.values())
+
+        blkio = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+        block_read = sum(entry.get("value", 0) for entry in blkio
+                         if entry.get("op", "").lower() == "read")
+        block_write = sum(entry.get("value", 0) for entry in blkio
+                          if entry.get("op", "").lower() == "write")
+        return (time.time(), cpu_percent, rss, net_rx, net_tx, block_read, block_write)
+
+    @property
+    def run_seconds(self):
+        """Seconds the container ran, None if it never started or has not exited"""
+        if self.started is None or self.stopped is None:
+            return None
+        return self.stopped - self.started
+
+    def output_size(self):
+        """Total size in bytes of the files in the scanner's own output
+
+        Scanners without an output_folder (or output_file) write into the
+        output directory of the domain, shared with every other tool, so
+        nothing can be attributed to them.
+
+        Returns:
+            (int) bytes, None if the scanner has no output of its own
+        """
+        output_file = self._docker_options.get('output_file', None)
+        if output_file:
+            try:
+                return getsize(join_abs(self.OUTPUT_DIR, output_file))
+            except OSError:
+                return 0
+        if not self._docker_options.get('output_folder', None):
+            return None
+        total = 0
+        for root, _, files in walk(self.OUTPUT_DIR or ""):
+            for name in files:
+                try:
+                    total += getsize(join_abs(root, name))
+                except OSError:
+                    pass
+        return total
 
     def run(self):
         """
@@ -168,19 +673,25 @@ class Docker:
 
         try:
             volumes = self._docker_options.get("volumes", None)
-            if volumes is None:
+            if volumes is None and (self.remote or self.warm):
+                # Output stays in the container until it is copied back
+                volumes = {}
+            elif volumes is None:
                 volumes = {
                     self.OUTPUT_DIR: {
                         'bind': self._docker_options['output'],
                         'mode': 'rw'
                     }
                 }
-            self.container = self.client.containers.run(
+            limits = {}
+            if self.cpus is not None:
+                limits['nano_cpus'] = int(float(self.cpus) * 1e9)
+            if self.memory is not None:
+                limits['mem_limit'] = self.memory
+            run_options = dict(
                 image=f"{self._docker_options['docker_name']}:{self._docker_options['docker_name']}",
                 # dns=[self._docker_options.get('dns')] if self._docker_options.get('dns', None) else None, # REMOVED in latest due to issues :/
-                auto_remove=True,
                 tty=True,
-                detach=True,
                 network_mode=self.network_mode,
                 command=self._docker_options.get(
                     'command',
@@ -188,9 +699,28 @@ class Docker:
                 ports=self._docker_options.get(
                     'ports',
                         None),
-                volumes=volumes)
+                volumes=volumes,
+                environment=self._environment(),
+                **limits)
+
+            if self.warm:
+                self._run_warm(run_options)
+            else:
+                self.container = self.client.containers.create(auto_remove=not self.remote,
+                                                               **run_options)
+                if self.remote:
+                    self._push_output()
+                # Registered before it starts, so its die event can not be missed
+                if self.watcher is not None:
+                    self.watcher.watch(self)
+                self.container.start()
+            if not self.warm:
+                self._start_log_follower()
+            if self.stats_interval:
+                threading.Thread(target=self._sample_stats, daemon=True).start()
 
             self.status = self.container.status
+            self.started = time.time()
 
             self._print(f"mount point specified here: {volumes}")
 
@@ -217,42 +747,340 @@ class Docker:
             LOG.exception("[!] Output directory could not be created, " +
                           "please verify permissions")
 
-    def monitor_build(self):
-        """Monitor build status of docker
+        if self.error:
+            if self.watcher is not None:
+                self.watcher.unwatch(self)
+            self._release_worker()
+            self.finished.set()
 
+    def _environment(self):
+        """Run time environment of the tool"""
+        if self.parameterized:
+            return {"TARGET": self._docker_options['target']}
+        return None
+
+    def _lock_worker(self, container_id):
+        """Claim a pool worker for this process, None if another job holds it"""
+        lock = open(join_abs(self.lock_dir, f"drrobot_worker_{container_id[:12]}.lock"), 'w')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def _release_worker(self):
+        if self._worker_lock is not None:
+            fcntl.flock(self._worker_lock, fcntl.LOCK_UN)
+            self._worker_lock.close()
+            self._worker_lock = None
+
+    def _claim_worker(self, run_options):
+        """Find an idle pool worker running the current image or start a new one
+
+        Workers of an outdated image are removed on the way.
+
+        Args:
+            run_options (Dict): options the container would be run with
+
+        Returns:
+            docker.models.containers.Container
         """
-        with tqdm() as pbar:
-            pbar.set_description(f"[#] Docker image {self.name}, building...")
-            while self.image is None and not self.error and not self.done_building:
-                time.sleep(2)
-                pbar.update(1)
+        tag = run_options['image']
+        workers = self.client.containers.list(filters={"label": f"{WORKER_LABEL}={tag}",
+                                                       "status": "running"})
+        for worker in workers:
+            self._worker_lock = self._lock_worker(worker.id)
+            if self._worker_lock is None:
+                continue
+            if worker.attrs.get("Image") == self.image.id:
+                self._print(f"Reusing worker {worker.short_id} for {self.name}")
+                return worker
+            self._print(f"Removing worker {worker.short_id} of outdated image {tag}")
+            worker.remove(force=True)
+            self._release_worker()
+
+        while self._worker_lock is None:
+            worker = self.client.containers.run(detach=True,
+                                                labels={WORKER_LABEL: tag},
+                                                **{**run_options,
+                                                   "entrypoint": WORKER_COMMAND,
+                                                   "command": None})
+            self._worker_lock = self._lock_worker(worker.id)
+        self._print(f"Started worker {worker.short_id} for {self.name}")
+        return worker
+
+    def _run_warm(self, run_options):
+        """Run the tool as an exec job in a pool worker
 
-    def update_status(self):
+        The entrypoint of the image is executed with TARGET set for this
+        domain. The worker's output folder is emptied and filled with the
+        current content of OUTPUT_DIR first, and copied back once the job is done.
         """
-        Thread watcher to update status of container
+        self.container = self._claim_worker(run_options)
+        output = shlex.quote(self._docker_options['output'].rstrip("/"))
+        self.container.exec_run(["/bin/sh", "-c", f"rm -rf {output} && mkdir -p {output}"])
+        self._push_output()
+
+        config = self.image.attrs.get("Config", {})
+        command = self._docker_options.get('command', None)
+        if isinstance(command, str):
+            command = shlex.split(command)
+        cmd = (config.get("Entrypoint") or []) + (command or config.get("Cmd") or [])
+        exec_id = self.client.api.exec_create(self.container.id, cmd,
+                                              tty=True,
+                                              environment=run_options['environment'],
+                                              workdir=config.get("WorkingDir") or None)["Id"]
+        threading.Thread(target=self._wait_exec, args=(exec_id,), daemon=True).start()
+
+    def _wait_exec(self, exec_id):
+        """Wait on the exec job of a pool worker, copy its output back and release the worker"""
+        exit_code = None
+        try:
+            self._follow_logs(self.client.api.exec_start(exec_id, stream=True))
+            exit_code = self.client.api.exec_inspect(exec_id).get("ExitCode")
+        except (APIError, OSError):
+            LOG.exception("[!] Error waiting on job of %s", self.name)
+        self._copy_output_back()
+        if self.timed_out:
+            # Stopping the job stopped the worker, it can not be reused
+            try:
+                self.container.remove(force=True)
+            except (NotFound, APIError):
+                LOG.exception("[!] Could not remove worker: %s", self.name)
+        self._release_worker()
+        self.exited(exit_code)
+
+    def _push_output(self):
+        """Copy the content of OUTPUT_DIR (e.g. infiles) into the output folder of the container"""
+        if not isdir(self.OUTPUT_DIR or ""):
+            return
+        with tempfile.TemporaryFile() as archive:
+            with tarfile.open(fileobj=archive, mode="w") as tar:
+                for name in sorted(listdir(self.OUTPUT_DIR)):
+                    tar.add(join_abs(self.OUTPUT_DIR, name), arcname=name)
+            archive.seek(0)
+            try:
+                self.container.put_archive(self._docker_options['output'], archive)
+            except (NotFound, APIError):
+                LOG.exception("[!] Could not copy input files into %s", self.name)
+
+    def exited(self, exit_code):
+        """Mark the container as exited. Called by ContainerWatcher.
 
         Args:
+            exit_code (int): exit code reported by the docker daemon
 
         Returns:
 
         """
-        if self.error:
-            return
+        self.status = 'exited'
+        self.exit_code = exit_code
+        if self.stopped is None:
+            self.stopped = time.time()
+        self._print(f"[*] Docker container {self._docker_options['docker_name']} exited with {exit_code}")
+        self.finished.set()
+
+    def fetch_output(self):
+        """Copy the output folder of a remote container into OUTPUT_DIR
+
+        The container is removed afterwards. Containers on the local daemon
+        write straight into the mounted OUTPUT_DIR so there is nothing to do.
+
+        Returns:
+            (bool) True if the output was copied
+        """
+        if not self.remote or self.warm or self.container is None:
+            return False
         try:
-            with tqdm() as pbar:
-                pbar.set_description(
-                    f"[#] Docker container {self.name}, running...")
-                while True:
-                    self.container.reload()
-                    time.sleep(2)
-                    self.status = self.container.status
-                    pbar.update(1)
+            return self._copy_output_back()
+        finally:
+            try:
+                self.container.remove(force=True)
+            except (NotFound, APIError):
+                LOG.exception("[!] Could not remove container: %s", self.name)
 
+    def _copy_output_back(self):
+        """Extract the output folder of the container into OUTPUT_DIR
+
+        Returns:
+            (bool) True if the output was copied
+        """
+        output = self._docker_options['output'].rstrip("/")
+        try:
+            stream, _ = self.container.get_archive(output)
+            makedirs(self.OUTPUT_DIR, exist_ok=True)
+            with tempfile.TemporaryFile() as archive:
+                for chunk in stream:
+                    archive.write(chunk)
+                archive.seek(0)
+                with tarfile.open(fileobj=archive) as tar:
+                    members = []
+                    for member in tar.getmembers():
+                        # Drop the output folder itself and anything escaping it
+                        _, _, name = member.name.partition("/")
+                        if not name or not (member.isfile() or member.isdir()):
+                            continue
+                        name = normpath(name)
+                        if isabs(name) or name.startswith(".."):
+                            continue
+                        member.name = name
+                        members += [member]
+                    tar.extractall(self.OUTPUT_DIR, members=members)
+            self._print(f"Copied {len(members)} entries from {output} into {self.OUTPUT_DIR}")
+            return True
         except NotFound:
-            self._print(f"[*] Docker container {self._docker_options['docker_name']} exited")
-            self.status = 'exited'
-        except AttributeError:
-            LOG.exception("AttributeError in update_status. Check logs")
-        except KeyboardInterrupt:
-            LOG.exception("KeyboardInterrupt in update_status. Check logs")
-            self.kill()
+            print(f"[!] No output found in {self.name} container at {output}")
+            LOG.exception("[!] Output folder missing: %s", self.name)
+        except (APIError, tarfile.TarError, OSError):
+            print(f"[!] Error copying output of {self.name}. Check logs")
+            LOG.exception("[!] Error copying output: %s", self.name)
+        return False
+
+
+class BaseImage:
+    """Base image shared by several scanner templates
+
+    Holds the layers most templates repeat (package installs, certs).
+    It is built at most once per docker daemon and run, scanners using it
+    wait for it before their own build. Like any other image it is not
+    rebuilt while its build context is unchanged.
+
+    Attributes:
+        name (str): key of the base image in the settings
+        tag (str): tag substituted for $base_image in the scanner templates
+    """
+    def __init__(self, **kwargs):
+        """
+        Args:
+            **kwargs: same arguments as Docker, docker_options must hold
+                name, docker_name and certs
+
+        Returns:
+
+        """
+        self._kwargs = kwargs
+        options = kwargs['docker_options']
+        self.name = options['name']
+        self.tag = f"{options['docker_name']}:{options['docker_name']}"
+        self._lock = threading.Lock()
+        self._images = {}
+
+    def get(self, client):
+        """Image of the base on the daemon of client, built on first use
+
+        Args:
+            client (docker.DockerClient): daemon the scanner is built on
+
+        Returns:
+            docker.models.images.Image, None if the build failed
+        """
+        with self._lock:
+            if client not in self._images:
+                base = Docker(**{**self._kwargs, "client": client})
+                base.build()
+                self._images[client] = None if base.error else base.image
+            return self._images[client]
+
+
+class ContainerWatcher(threading.Thread):
+    """Single thread reporting when containers exit
+
+    Subscribes to the docker events stream for container "die" events
+    instead of polling every container. The subscription is opened in
+    the constructor and containers are watched between create and start,
+    so no exit can be missed even with auto_remove. Die events of other
+    containers on the daemon are ignored.
+
+    The thread finishes once close has been called and every watched
+    container has exited, so it can be joined like any other scanner thread.
+    """
+    def __init__(self, client, name=None):
+        super().__init__(daemon=True)
+        self.client = client
+        self._lock = threading.Lock()
+        self._watched = {}
+        self._closed = False
+        self._pbar = tqdm(total=0, desc="[#] Docker containers running" +
+                          (f" on {name}" if name else ""))
+        self._events = client.events(decode=True,
+                                     filters={"type": "container",
+                                              "event": "die"})
+
+    def watch(self, scanner):
+        """Report the exit of the container of scanner
+
+        Must be called after the container is created and before it is started.
+
+        Args:
+            scanner (Docker): scanner whose container is about to start
+
+        Returns:
+
+        """
+        if scanner.container is None:
+            return
+        with self._lock:
+            self._watched[scanner.container.id] = scanner
+            self._pbar.total += 1
+            self._pbar.refresh()
+
+    def unwatch(self, scanner):
+        """Stop watching the container of scanner, e.g. because it failed to start
+
+        Args:
+            scanner (Docker): scanner passed to watch
+
+        Returns:
+
+        """
+        if scanner.container is None:
+            return
+        with self._lock:
+            if self._watched.pop(scanner.container.id, None) is None:
+                return
+            self._pbar.total -= 1
+            self._pbar.refresh()
+            done = self._closed and not self._watched
+        if done:
+            self._events.close()
+
+    def close(self):
+        """No more containers will be watched. The thread exits once the
+        remaining containers are done.
+        """
+        with self._lock:
+            self._closed = True
+            done = not self._watched
+        if done:
+            self._events.close()
+
+    def run(self):
+        try:
+            for event in self._events:
+                container_id = event.get("id") or event.get("Actor", {}).get("ID")
+                exit_code = event.get("Actor", {}).get("Attributes", {}).get("exitCode")
+                exit_code = int(exit_code) if exit_code is not None else None
+                with self._lock:
+                    scanner = self._watched.pop(container_id, None)
+                    done = self._closed and not self._watched
+                if scanner is not None:
+                    scanner.exited(exit_code)
+                    self._pbar.update(1)
+                if done:
+                    break
+        except (APIError, OSError):
+            LOG.exception("[!] Error in docker event stream")
+        finally:
+            with self._lock:
+                orphans = list(self._watched.values())
+                self._watched = {}
+            # The event stream ended early, fall back to blocking on each container
+            for scanner in orphans:
+                try:
+                    exit_code = scanner.container.wait().get("StatusCode")
+                except (NotFound, APIError, OSError):
+                    exit_code = None
+                scanner.exited(exit_code)
+                self._pbar.update(1)
+            self._pbar.close()
@@ -0,0 +1,96 @@
+# -*- coding: utf8 -*-
+""" Images module
+
+Export and import of the scanner images built by Dr.ROBOT.
+
+Every image built by Dr.ROBOT carries the CONTEXT_LABEL label. Export saves
+all of them into a single archive holding one ``docker save`` tar per image,
+import loads them back so a fresh worker does not have to build (and fetch
+sources for) every scanner. Since the label is kept, imported images are
+used as is by the next gather as long as their build context did not change.
+"""
+import logging
+import tarfile
+import tempfile
+from tqdm import tqdm
+from docker.errors import APIError, ImageLoadError
+
+from robot_api.api.dockerize import CONTEXT_LABEL
+
+LOG = logging.getLogger(__name__)
+
+
+def _mode(filename, write):
+    """Tar mode for filename, gzip compressed if it ends in .gz/.tgz"""
+    if not write:
+        return "r:*"
+    if filename.endswith((".gz", ".tgz")):
+        return "w:gz"
+    return "w"
+
+
+def built_images(client):
+    """Images on the daemon built by Dr.ROBOT
+
+    Args:
+        client (docker.DockerClient): client of the daemon
+
+    Returns:
+        (List) docker.models.images.Image with at least one tag
+    """
+    return [image for image in client.images.list(filters={"label": CONTEXT_LABEL})
+            if image.tags]
+
+
+def export_images(client, filename):
+    """Save every image built by Dr.ROBOT into filename
+
+    Args:
+        client (docker.DockerClient): client of the daemon holding the images
+        filename (str): archive to write, gzip compressed if it ends in .gz/.tgz
+
+    Returns:
+        (List) tags of the exported images
+    """
+    exported = []
+    images = built_images(client)
+    with tarfile.open(filename, _mode(filename, True)) as bundle:
+        for image in tqdm(images, desc="[#] Exporting images"):
+            tag = image.tags[0]
+            try:
+                # The size of a save is only known once it is written out
+                with tempfile.TemporaryFile() as saved:
+                    for chunk in image.save(named=True):
+                        saved.write(chunk)
+                    info = tarfile.TarInfo(tag.replace("/", "_").replace(":", "_") + ".tar")
+                    info.size = saved.tell()
+                    saved.seek(0)
+                    bundle.addfile(info, saved)
+                exported += [tag]
+            except (APIError, OSError):
+                print(f"[!] Error exporting {tag}. Check logs")
+                LOG.exception("[!] Error exporting image %s", tag)
+    return exported
+
+
+def import_images(client, filename):
+    """Load every image of an archive written by export_images
+
+    Args:
+        client (docker.DockerClient): client of the daemon to load into
+        filename (str): archive written by export_images
+
+    Returns:
+        (List) tags of the imported images
+    """
+    imported = []
+    with tarfile.open(filename, _mode(filename, False)) as bundle:
+        members = [member for member in bundle.getmembers() if member.isfile()]
+        for member in tqdm(members, desc="[#] Importing images"):
+            try:
+                for image in client.images.load(bundle.extractfile(member)):
+                    imported += image.tags
+            except (APIError, ImageLoadError, OSError):
+                print(f"[!] Error importing {member.name}. Check logs")
+                LOG.exception("[!] Error importing image %s", member.name)
+    return imported
@@ -0,0 +1,235 @@
+# -*- coding: utf8 -*-
+""" Ingest module
+
+Feed scanner output into the database while the scanners are still running.
+
+Tools such as Amass or MassDNS write their results line by line into their
+output folder. The OutputWatcher follows every output file of a gather,
+parses complete lines as they are appended and inserts the hosts found into
+the database, so results can be queried while the gather is running. The
+final aggregation only has to read files that grew after the last pass.
+
+On Linux the watcher sleeps on inotify and only rescans the output folders
+after something was written to them. Elsewhere, or if inotify is not
+available, it rescans every poll_interval seconds.
+
+Attributes:
+    MAX_READ (int): bytes read from a single file per pass
+    WATCH_MASK (int): inotify events that wake the watcher
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import walk
+from os.path import dirname
+
+from robot_api.api.aggregation import compile_patterns, parse_line
+from robot_api.parse import join_abs
+
+LOG = logging.getLogger(__name__)
+
+MAX_READ = 4 * 1024 * 1024
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+WATCH_MASK = 0x2 | 0x8 | 0x80 | 0x100
+
+
+class _Inotify:
+    """Minimal inotify binding through libc, only used to wake up on writes
+
+    Raises:
+        OSError: inotify is not available on this system
+    """
+    def __init__(self):
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except AttributeError:
+            raise OSError("inotify is not supported on this system")
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched = set()
+
+    def watch(self, folder):
+        """Wake up on writes to files directly inside folder"""
+        if folder in self._watched:
+            return
+        if self._libc.inotify_add_watch(self.fd, folder.encode(), WATCH_MASK) < 0:
+            LOG.debug("Could not watch %s: %s", folder, os.strerror(ctypes.get_errno()))
+            return
+        self._watched.add(folder)
+
+    def wait(self, timeout):
+        """Block until an event arrives or timeout seconds passed
+
+        Returns:
+            (bool) True if something was written
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class OutputWatcher(threading.Thread):
+    """Tails the output files of a gather into the database
+
+    Only complete lines are parsed while the tools are running. Once stop
+    is called a last pass reads every file to its end, afterwards offsets
+    maps every file to the number of bytes ingested. Offsets only move once
+    the hosts read are committed, if the database fails they are dropped
+    so the final aggregation reads every file again.
+
+    Attributes:
+        offsets (Dict): file path -> bytes stored in the database so far
+        ingested (int): number of hosts inserted, hostnames already stored are not counted
+    """
+    def __init__(self, aggregation, output_files=(), output_folders=(),
+                 poll_interval=2, workers=5):
+        """
+        Args:
+            aggregation (Aggregation): aggregation of the domain being gathered
+            output_files (List): output files referenced in config.json
+            output_folders (List): output folders of the tools
+            poll_interval (float): seconds between scans of the output folders
+            workers (int): threads resolving hosts and ips of new lines
+
+        Returns:
+
+        """
+        super().__init__(daemon=True)
+        self.aggregation = aggregation
+        self.output_files = list(output_files)
+        self.output_folders = list(output_folders)
+        self.poll_interval = poll_interval
+        self.offsets = {}
+        self.ingested = 0
+        self._patterns = compile_patterns(aggregation.domain)
+        self._executor = ThreadPoolExecutor(workers)
+        self._stopped = threading.Event()
+        try:
+            self._inotify = _Inotify()
+        except OSError:
+            LOG.info("inotify not available, polling output folders every %ss", poll_interval)
+            self._inotify = None
+
+    def stop(self):
+        """Read the remaining output and finish the thread
+        """
+        self._stopped.set()
+
+    def _parse(self, line):
+        return parse_line(line, *self._patterns)
+
+    def _read_new(self, filename, final):
+        """New lines of filename since the last pass
+
+        Args:
+            filename (str): output file
+            final (bool): also return a trailing line without newline
+
+        Returns:
+            A tuple (list of lines, offset after them,
+            True if more than MAX_READ bytes were waiting)
+        """
+        try:
+            with open(filename, 'rb') as _file:
+                size = os.fstat(_file.fileno()).st_size
+                offset = self.offsets.get(filename, 0)
+                if size < offset:
+                    # Truncated or rewritten by the tool, start over
+                    offset = 0
+                _file.seek(offset)
+                data = _file.read(min(size - offset, MAX_READ))
+        except OSError:
+            LOG.debug("Could not read %s", filename, exc_info=True)
+            return [], self.offsets.get(filename, 0), False
+        capped = size - offset > MAX_READ
+        if capped or not final:
+            end = data.rfind(b"\n") + 1
+            # A single line longer than MAX_READ is split rather than never read
+            if end or not capped:
+                data = data[:end]
+        return data.decode('utf-8', errors='replace').splitlines(), offset + len(data), capped
+
+    def _ingest(self, dbconn, final=False):
+        """Parse and insert every line appended since the last pass
+
+        Returns:
+            (bool) True if some file had more than MAX_READ bytes waiting
+        """
+        lines = []
+        offsets = {}
+        behind = False
+        for filename in self.aggregation.output_paths(self.output_files,
+                                                      self.output_folders,
+                                                      warn=False):
+            new_lines, offsets[filename], capped = self._read_new(filename, final)
+            lines += new_lines
+            behind = behind or capped
+        if lines:
+            hosts = [found for found in self._executor.map(self._parse, lines)
+                     if found is not None]
+            if hosts:
+                self.ingested += self.aggregation.insert_hosts(dbconn, hosts)
+        # Only once the hosts are committed, a failed insert leaves the lines unread
+        self.offsets.update(offsets)
+        return behind
+
+    def _watch_folders(self):
+        folders = [join_abs(self.aggregation.output_dir, folder)
+                   for folder in self.output_folders]
+        folders += [dirname(join_abs(self.aggregation.output_dir, name))
+                    for name in self.output_files]
+        for folder in folders:
+            for root, _, _ in walk(folder):
+                self._inotify.watch(root)
+
+    def _wait(self):
+        """Sleep until there is new output, at most once every poll_interval"""
+        if self._inotify is None:
+            self._stopped.wait(self.poll_interval)
+            return
+        start = time.monotonic()
+        while not self._stopped.is_set():
+            # Folders created since the last pass need their own watch
+            self._watch_folders()
+            if self._inotify.wait(1):
+                break
+        self._stopped.wait(max(self.poll_interval - (time.monotonic() - start), 0))
+
+    def run(self):
+        try:
+            dbconn = self.aggregation.open_db()
+        except sqlite3.Error:
+            LOG.exception("[!] Could not open database for live ingestion")
+            return
+        try:
+            while not self._stopped.is_set():
+                if not self._ingest(dbconn):
+                    self._wait()
+            while self._ingest(dbconn, final=True):
+                pass
+            LOG.info("Ingested %d hosts from %d files", self.ingested, len(self.offsets))
+        except sqlite3.Error:
+            LOG.exception("[!] Error during live ingestion")
+            # Part of the output may be missing, aggregate reads every file again
+            self.offsets = {}
+        finally:
+            dbconn.close()
+            self._executor.shutdown()
+            if self._inotify is not None:
+                self._inotify.close()
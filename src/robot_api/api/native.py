@@ -0,0 +1,188 @@
+# -*- coding: utf8 -*-
+""" Native module
+
+Run tools that are installed on the host as managed subprocesses instead of
+docker containers. The output folder contract is the same as for docker
+scanners: everything the tool writes to stdout ends up in a file under
+OUTPUT_DIR/<output_folder>, which is then aggregated.
+
+Attributes:
+    _native_options (dict): options of the tool from config.json
+    verbose (bool): More output Yes/No
+    argv (List): command line after replacements
+    process (subprocess.Popen): process object when running
+    exit_code (int): exit code of the process once it has exited
+    timeout (int): seconds the process may run before it is stopped
+    timed_out (bool): If the process was stopped for running too long
+    started (float): epoch time the process was started
+    stopped (float): epoch time the process exited
+    name (str): name of the tool
+    samples (List): resource samples, always empty for native tools
+"""
+import logging
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from os import environ, walk, makedirs
+from os.path import getsize
+from string import Template
+
+from robot_api.parse import join_abs
+
+LOG = logging.getLogger(__name__)
+
+
+class Native(threading.Thread):
+    """Runs native_command of a tool and streams its stdout to native_output
+
+    The thread finishes once the process has exited, so it can be joined
+    like the other gather threads.
+    """
+    def __init__(self, **kwargs):
+        """Constructor
+
+        Args:
+            **kwargs:
+                native_options : (Dict) options of the tool, must hold name and native_command
+                output_dir: (String) folder the output file is written to
+                log_dir: (String) folder for the stderr log of the tool
+                default_timeout: (int) timeout for tools without "timeout", 0 for none
+                stop_grace: (int) seconds between SIGTERM and SIGKILL
+                verbose: (bool) More output Yes/No
+
+        Returns:
+
+        """
+        super().__init__(daemon=True)
+        self._native_options = kwargs.get('native_options', None)
+        self.name = self._native_options['name']
+        self.OUTPUT_DIR = kwargs.get('output_dir', None)
+        self.log_dir = kwargs.get('log_dir', None)
+        self.verbose = kwargs.get('verbose', False)
+        self.timeout = self._native_options.get('timeout', None) or kwargs.get('default_timeout', 0)
+        self.stop_grace = kwargs.get('stop_grace', 10)
+        self.output_file = join_abs(self.OUTPUT_DIR,
+                                    self._native_options.get('native_output',
+                                                             f"{self.name.lower()}.txt"))
+        self.argv = None
+        self.process = None
+        self.error = False
+        self.exit_code = None
+        self.timed_out = False
+        self.build_seconds = 0
+        self.started = None
+        self.stopped = None
+        self.samples = []
+
+    def _print(self, msg):
+        if self.verbose:
+            print("[D] " + msg)
+        LOG.debug(msg)
+
+    def build(self):
+        """Build the command line from native_command
+
+        Every argument is substituted separately so replacements with
+        spaces stay a single argument.
+
+        Raises:
+            OSError: the tool is not installed on the host
+        """
+        replacements = {k: v if v else ""
+                        for k, v in self._native_options.items()
+                        if not isinstance(v, (dict, list))}
+        replacements.update({"output": self.OUTPUT_DIR})
+        self.argv = [Template(arg).safe_substitute(replacements)
+                     for arg in shlex.split(self._native_options['native_command'])]
+        if shutil.which(self.argv[0]) is None:
+            raise OSError(f"{self.argv[0]} is not installed")
+        self._print(f"Native command for {self.name}: {self.argv}")
+
+    def _env(self):
+        env = dict(environ)
+        proxy = self._native_options.get('proxy', None)
+        if proxy:
+            env.update({"http_proxy": proxy, "https_proxy": proxy})
+        return env
+
+    @property
+    def run_seconds(self):
+        """Seconds the process ran, None if it never started or has not exited"""
+        if self.started is None or self.stopped is None:
+            return None
+        return self.stopped - self.started
+
+    def output_size(self):
+        """Total size in bytes of the files in the output directory"""
+        total = 0
+        for root, _, files in walk(self.OUTPUT_DIR or ""):
+            for name in files:
+                try:
+                    total += getsize(join_abs(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def run(self):
+        """Run the tool until it exits or its timeout is reached
+
+        Args:
+
+        Returns:
+
+        """
+        try:
+            self.build()
+            makedirs(self.OUTPUT_DIR, exist_ok=True)
+            log_file = join_abs(self.log_dir or self.OUTPUT_DIR, f"native_{self.name.lower()}.log")
+            with open(self.output_file, 'wb') as stdout, open(log_file, 'wb') as stderr:
+                self.process = subprocess.Popen(self.argv,
+                                                stdout=stdout,
+                                                stderr=stderr,
+                                                stdin=subprocess.DEVNULL,
+                                                cwd=self.OUTPUT_DIR,
+                                                env=self._env())
+                self.started = time.time()
+                try:
+                    self.exit_code = self.process.wait(self.timeout or None)
+                except subprocess.TimeoutExpired:
+                    print(f"[!] {self.name} timed out after {self.timeout}s, stopping. " +
+                          "Output written so far will be aggregated")
+                    self.stop()
+                self.stopped = time.time()
+            if self.exit_code and not self.timed_out:
+                print(f"[!] {self.name} exited with {self.exit_code}, see {log_file}")
+        except OSError:
+            print(f"[!] Could not run {self.name} natively. Check logs")
+            LOG.exception("[!] OSError in native %s", self.name)
+            self.error = True
+        except subprocess.SubprocessError:
+            print(f"[!] SubprocessError in {self.name}. Check logs")
+            LOG.exception("[!] SubprocessError in native %s", self.name)
+            self.error = True
+
+    def stop(self, grace=None):
+        """Sends SIGTERM and kills the process if it is still running after grace seconds
+
+        Args:
+            grace (int): seconds to wait before killing, stop_grace by default
+
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.timed_out = True
+        self.process.terminate()
+        try:
+            self.exit_code = self.process.wait(self.stop_grace if grace is None else grace)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+    def kill(self):
+        """Kills the process
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.kill()
+        self.exit_code = self.process.wait()
@@ -0,0 +1,530 @@
+# -*- coding: utf8 -*-
+""" Scheduler module
+
+Schedules the build and run phases of docker scanners.
+
+Every scanner is pushed through its own build -> run chain so a container
+starts as soon as its own image is ready, instead of waiting on the
+slowest build. Scanners may name other scanners in "depends_on", in which
+case their container is only started once those scanners have finished.
+
+Containers are only started once the Scheduler has room for them, based on
+a concurrency cap and the cpu/memory hints under "resources" of each scanner.
+When several containers are waiting, the one with the longest recorded run
+time goes first (longest processing time first) to shorten the total run.
+
+Containers running longer than their "timeout" are stopped, whatever they
+wrote to their output folder so far is still aggregated.
+
+The progress bar shows the build step of every image being built and the
+output written by every running container, both read from their log streams.
+
+With several docker "endpoints" configured, the Dispatcher places every
+scanner on one of the daemons before it is built. Each daemon has its own
+Scheduler and ContainerWatcher. Output of containers on remote daemons is
+copied back into the output folder once they exit.
+"""
+import logging
+import os
+import threading
+import time
+from tqdm import tqdm
+from docker.errors import DockerException
+from docker.tls import TLSConfig
+from docker.utils import parse_bytes
+
+from robot_api.api.dockerize import ContainerWatcher, get_client, is_local_url
+from robot_api.parse import join_abs
+
+LOG = logging.getLogger(__name__)
+
+
+def resolve_dependencies(scanners, configs):
+    """Map every scanner to the scanner objects it depends on
+
+    Dependencies on scanners which are not part of this run are ignored.
+    Circular dependencies are dropped with a warning so they can not
+    deadlock the pipeline.
+
+    Args:
+        scanners (Dict): config key -> Docker object
+        configs (Dict): config key -> scanner config from config.json
+
+    Returns:
+        (Dict) Docker object -> list of Docker objects it waits on
+    """
+    graph = {key: [dep for dep in configs[key].get("depends_on", [])
+                   if dep in scanners and dep != key]
+             for key in scanners}
+
+    def reaches(start, target, seen):
+        for dep in graph[start]:
+            if dep == target:
+                return True
+            if dep not in seen:
+                seen.add(dep)
+                if reaches(dep, target, seen):
+                    return True
+        return False
+
+    for key in graph:
+        circular = [dep for dep in graph[key] if reaches(dep, key, set())]
+        if circular:
+            print(f"[!] Circular depends_on for {key}: {circular}, ignoring")
+            graph[key] = [dep for dep in graph[key] if dep not in circular]
+
+    return {scanners[key]: [scanners[dep] for dep in deps]
+            for key, deps in graph.items()}
+
+
+class Scheduler:
+    """Admits containers against a concurrency cap and the host's cpus/memory
+
+    Every container reserves the cpus and memory given in its "resources"
+    hint (or the defaults) until it finishes. A container that asks for more
+    than the host has is still started once nothing else is running so it
+    can not wait forever.
+
+    Waiting containers are ordered by their expected run time from history,
+    longest first. Scanners without history are expected to take the
+    average of the known ones. Smaller containers may start ahead of a
+    waiter that does not fit yet, until that waiter has waited
+    max_backfill_wait seconds. From then on freed resources are kept for it.
+    """
+    def __init__(self, max_containers=0, cpus=None, memory=None,
+                 default_cpus=1, default_memory="512m", history=None,
+                 max_backfill_wait=600):
+        """
+        Args:
+            max_containers (int): containers allowed at once, 0 for no cap
+            cpus (float): cpus available to containers, None for no limit
+            memory (int): bytes available to containers, None for no limit
+            default_cpus (float): reservation for scanners without hints
+            default_memory (str/int): reservation for scanners without hints
+            history (Dict): scanner name -> average run seconds
+            max_backfill_wait (float): seconds a waiter may be passed by
+                smaller containers, 0 for no limit
+
+        Returns:
+
+        """
+        self.max_containers = max_containers or 0
+        self.cpus = cpus
+        self.memory = memory
+        self.default_cpus = float(default_cpus)
+        self.default_memory = parse_bytes(default_memory)
+        self.max_backfill_wait = max_backfill_wait or 0
+        self._cond = threading.Condition()
+        self._running = {}
+        self._waiting = []
+        self.history = history or {}
+        self._default_duration = (sum(self.history.values()) / len(self.history)
+                                  if self.history else 0)
+
+    @classmethod
+    def from_settings(cls, client, settings, history=None):
+        """Build a scheduler from the "Docker" settings and the capacity
+        reported by the docker daemon.
+
+        Args:
+            client (docker.DockerClient): client of the daemon running the containers
+            settings (Dict): "Docker" section of the Settings in config.json
+            history (Dict): scanner name -> average run seconds
+
+        Returns:
+            Scheduler
+        """
+        try:
+            info = client.info()
+            cpus = info.get("NCPU") or os.cpu_count()
+            memory = info.get("MemTotal")
+        except Exception:
+            LOG.exception("Could not read docker host capacity, using local host")
+            cpus, memory = os.cpu_count(), None
+
+        if cpus is not None:
+            cpus = max(cpus - float(settings.get("reserve_cpus", 0)), 1)
+        if memory is not None:
+            memory = max(memory - parse_bytes(settings.get("reserve_memory", 0)), 0)
+
+        return cls(max_containers=settings.get("max_containers", 0),
+                   cpus=cpus,
+                   memory=memory,
+                   default_cpus=settings.get("default_cpus", 1),
+                   default_memory=settings.get("default_memory", "512m"),
+                   history=history,
+                   max_backfill_wait=settings.get("max_backfill_wait", 600))
+
+    def expected_duration(self, scanner):
+        """Expected run time of scanner in seconds from its history"""
+        return self.history.get(scanner.name, self._default_duration)
+
+    def _request(self, scanner):
+        cpus = scanner.cpus if scanner.cpus is not None else self.default_cpus
+        memory = parse_bytes(scanner.memory) if scanner.memory is not None else self.default_memory
+        return float(cpus), memory
+
+    def _fits(self, request):
+        if not self._running:
+            return True
+        if self.max_containers and len(self._running) >= self.max_containers:
+            return False
+        cpus, memory = request
+        used_cpus = sum(cpu for cpu, _ in self._running.values())
+        used_memory = sum(mem for _, mem in self._running.values())
+        if self.cpus is not None and used_cpus + cpus > self.cpus:
+            return False
+        if self.memory is not None and used_memory + memory > self.memory:
+            return False
+        return True
+
+    def _starving(self, since):
+        return bool(self.max_backfill_wait) and time.monotonic() - since > self.max_backfill_wait
+
+    def _can_start(self, scanner, request):
+        """A waiter starts if it fits, nobody queued ahead of it does
+        and nobody ahead of it waited longer than max_backfill_wait"""
+        for waiting, waiting_request, since in self._waiting:
+            if waiting is scanner:
+                return self._fits(request)
+            if self._fits(waiting_request) or self._starving(since):
+                return False
+        return False
+
+    def acquire(self, scanner):
+        """Block until there is room to start the container of scanner
+
+        Args:
+            scanner (Docker): scanner about to be run
+
+        Returns:
+
+        """
+        request = self._request(scanner)
+        with self._cond:
+            self._waiting += [(scanner, request, time.monotonic())]
+            # Stable sort keeps arrival order between equal durations
+            self._waiting.sort(key=lambda waiting: -self.expected_duration(waiting[0]))
+            if not self._can_start(scanner, request):
+                LOG.info("%s queued for resources", scanner.name)
+            self._cond.wait_for(lambda: self._can_start(scanner, request))
+            self._waiting = [waiting for waiting in self._waiting
+                             if waiting[0] is not scanner]
+            self._running[scanner] = request
+            self._cond.notify_all()
+
+    def release(self, scanner):
+        """Return the resources held by scanner
+
+        Args:
+            scanner (Docker): scanner whose container finished
+
+        Returns:
+
+        """
+        with self._cond:
+            self._running.pop(scanner, None)
+            self._cond.notify_all()
+
+
+class Endpoint:
+    """A docker daemon scanners can be placed on
+
+    Attributes:
+        name (str): base_url of the daemon, "local" for the one from the environment
+        client (docker.DockerClient): shared client of the daemon
+        scheduler (Scheduler): admits containers on this daemon
+        watcher (ContainerWatcher): started watcher for container exits on this daemon
+        local (bool): If the daemon can mount the local output directory
+    """
+    def __init__(self, client, scheduler, name="local", local=True):
+        self.name = name
+        self.client = client
+        self.scheduler = scheduler
+        self.local = local
+        # Subscribe to container events before anything is started
+        self.watcher = ContainerWatcher(client, None if local else name)
+        self.watcher.start()
+        self.expected = 0
+        self.placed = 0
+
+    @property
+    def slots(self):
+        """Number of containers expected to run at once on the daemon"""
+        if self.scheduler.max_containers:
+            return self.scheduler.max_containers
+        return max(int(self.scheduler.cpus or 1), 1)
+
+    def finish_time(self, duration):
+        """Expected time until everything placed here is done if a scanner
+        taking duration seconds was added. Ties go to the daemon with fewer scanners.
+        """
+        return ((self.expected + duration) / self.slots,
+                (self.placed + 1) / self.slots)
+
+
+def _tls_config(endpoint):
+    """TLS settings of an endpoint from "tls" and "cert_path"
+
+    cert_path is a directory holding ca.pem, cert.pem and key.pem,
+    the same layout as DOCKER_CERT_PATH.
+    """
+    cert_path = endpoint.get("cert_path")
+    if cert_path:
+        return TLSConfig(client_cert=(join_abs(cert_path, "cert.pem"),
+                                      join_abs(cert_path, "key.pem")),
+                         ca_cert=join_abs(cert_path, "ca.pem"),
+                         verify=True)
+    return bool(endpoint.get("tls", False))
+
+
+def connect_endpoints(settings):
+    """Clients of every daemon listed under "endpoints" of the "Docker"
+    settings, or only of the local daemon if there are none.
+
+    Unreachable daemons are skipped with a warning.
+
+    Args:
+        settings (Dict): "Docker" section of the Settings in config.json
+
+    Returns:
+        (List) of (endpoint settings, name, docker.DockerClient)
+
+    Raises:
+        DockerException: none of the daemons could be reached
+    """
+    connected = []
+    error = None
+    for endpoint in settings.get("endpoints") or [{}]:
+        base_url = endpoint.get("base_url") or None
+        name = base_url or "local"
+        try:
+            client = get_client(settings.get("max_pool_size"), base_url,
+                                _tls_config(endpoint))
+            client.ping()
+            connected += [(endpoint, name, client)]
+        except DockerException as err:
+            print(f"[!] Docker endpoint {name} is unreachable, skipping it")
+            LOG.exception("Connecting to docker endpoint %s", name)
+            error = err
+    if not connected:
+        raise error
+    return connected
+
+
+class Dispatcher:
+    """Places scanner containers across one or more docker daemons
+
+    Scanners are placed longest expected run first, each onto the daemon
+    expected to be done soonest (relative to its container slots).
+    Scanners with their own "volumes" refer to paths on this host and are
+    always placed on the local daemon when it is one of the endpoints.
+    """
+    def __init__(self, endpoints):
+        """
+        Args:
+            endpoints (List): Endpoint objects to place scanners on
+
+        Returns:
+
+        """
+        self.endpoints = endpoints
+        self._placement = {}
+
+    @classmethod
+    def from_settings(cls, settings, history=None):
+        """Connect to every daemon listed under "endpoints" of the "Docker"
+        settings, or only to the local daemon if there are none.
+
+        Every endpoint may override the Scheduler settings (max_containers,
+        reserve_cpus, ...) for its own daemon.
+
+        Args:
+            settings (Dict): "Docker" section of the Settings in config.json
+            history (Dict): scanner name -> average run seconds
+
+        Returns:
+            Dispatcher
+
+        Raises:
+            DockerException: none of the daemons could be reached
+        """
+        endpoints = []
+        for endpoint, name, client in connect_endpoints(settings):
+            scheduler = Scheduler.from_settings(client, {**settings, **endpoint}, history)
+            endpoints += [Endpoint(client, scheduler, name,
+                                   local=is_local_url(endpoint.get("base_url") or None))]
+        return cls(endpoints)
+
+    def place(self, scanners):
+        """Assign every scanner to an endpoint
+
+        Args:
+            scanners (List): Docker objects to place
+
+        Returns:
+
+        """
+        local = [endpoint for endpoint in self.endpoints if endpoint.local]
+        scheduler = self.endpoints[0].scheduler
+        ordered = sorted(scanners, key=lambda scanner: -scheduler.expected_duration(scanner))
+        for scanner in ordered:
+            duration = scheduler.expected_duration(scanner)
+            candidates = self.endpoints
+            if scanner.host_volumes:
+                if local:
+                    candidates = local
+                else:
+                    print(f"[!] {scanner.name} mounts host volumes but no local " +
+                          "docker endpoint is configured")
+            endpoint = min(candidates, key=lambda candidate: candidate.finish_time(duration))
+            endpoint.expected += duration
+            endpoint.placed += 1
+            scanner.client = endpoint.client
+            scanner.remote = not endpoint.local
+            if scanner.warm and scanner.remote:
+                # Workers are claimed with a lock file on this host, another host
+                # sharing the daemon could claim the same worker
+                LOG.warning("warm_pool is only used on local daemons, %s on %s " +
+                            "runs in a new container", scanner.name, endpoint.name)
+                scanner.warm = False
+            self._placement[scanner] = endpoint
+            if len(self.endpoints) > 1:
+                LOG.info("Placed %s on %s", scanner.name, endpoint.name)
+
+    def endpoint(self, scanner):
+        """Endpoint scanner was placed on"""
+        return self._placement[scanner]
+
+    def close(self):
+        """No more containers will be started, wait on every watcher
+        """
+        for endpoint in self.endpoints:
+            endpoint.watcher.close()
+        for endpoint in self.endpoints:
+            endpoint.watcher.join()
+
+
+class Pipeline(threading.Thread):
+    """Runs the build -> run chain of every scanner concurrently
+
+    The thread finishes once every container has exited (or failed to
+    build/start) and the output of remote containers has been copied back,
+    so it can be joined like the other gather threads.
+    """
+    def __init__(self, scanners, dependencies, dispatcher,
+                 default_timeout=0, stop_grace=10):
+        """
+        Args:
+            scanners (List): Docker objects to build and run
+            dependencies (Dict): Docker object -> Docker objects it waits on
+            dispatcher (Dispatcher): places scanners on the docker endpoints
+            default_timeout (int): run timeout for scanners without "timeout", 0 for none
+            stop_grace (int): seconds between stop and kill of a timed out container
+
+        Returns:
+
+        """
+        super().__init__(daemon=True)
+        self.scanners = scanners
+        self.dependencies = dependencies
+        self.dispatcher = dispatcher
+        self.default_timeout = default_timeout
+        self.stop_grace = stop_grace
+        self._stopped = threading.Event()
+        self._done = {scanner: threading.Event() for scanner in scanners}
+        self._pbar = None
+        self._progress_lock = threading.Lock()
+
+    def _chain(self, scanner):
+        """Build, wait on dependencies then run a single scanner
+        """
+        try:
+            self._build_and_run(scanner, self.dispatcher.endpoint(scanner))
+        except Exception:
+            LOG.exception("[!] Error in pipeline for %s", scanner.name)
+            scanner.error = True
+            scanner.finished.set()
+        finally:
+            self._done[scanner].set()
+
+    def _build_and_run(self, scanner, endpoint):
+        scanner.build()
+        self._pbar.update(1)
+        if scanner.error or scanner.image is None:
+            print(f"[!] Error building {scanner.name}. Check logs")
+            scanner.finished.set()
+            return
+
+        # Wait until dependencies exited and their output is copied back
+        for dependency in self.dependencies.get(scanner, []):
+            if not self._done[dependency].is_set():
+                LOG.info("%s waiting on %s", scanner.name, dependency.name)
+            self._done[dependency].wait()
+
+        endpoint.scheduler.acquire(scanner)
+        try:
+            if self._stopped.is_set():
+                scanner.finished.set()
+                return
+            if not scanner.warm:
+                # Pool workers keep running, their job reports its own exit
+                scanner.watcher = endpoint.watcher
+            scanner.run()
+            timeout = scanner.timeout or self.default_timeout
+            if not scanner.finished.wait(timeout or None):
+                print(f"[!] {scanner.name} timed out after {timeout}s, stopping. " +
+                      "Output written so far will be aggregated")
+                self._stop_scanner(scanner)
+        finally:
+            endpoint.scheduler.release(scanner)
+        scanner.fetch_output()
+
+    def _progress(self, _scanner):
+        """Show the build step or output written of every active scanner"""
+        parts = []
+        for scanner in self.scanners:
+            if scanner.error or scanner.finished.is_set():
+                continue
+            if scanner.started is not None:
+                parts += [f"{scanner.name} {tqdm.format_sizeof(scanner.log_bytes, 'B', 1024)}"]
+            elif scanner.build_step is not None and not scanner.done_building:
+                parts += [f"{scanner.name} {scanner.build_step[0]}/{scanner.build_step[1]}"]
+        with self._progress_lock:
+            if self._pbar is not None:
+                self._pbar.set_postfix_str(", ".join(parts))
+
+    def _stop_scanner(self, scanner):
+        scanner.timed_out = True
+        scanner.stop(self.stop_grace)
+        if not scanner.finished.wait(self.stop_grace * 2 + 5):
+            LOG.warning("No exit reported for %s after stop", scanner.name)
+            scanner.exited(None)
+
+    def stop(self):
+        """Stop every running container and start no new ones
+        """
+        self._stopped.set()
+        stops = [threading.Thread(target=self._stop_scanner, args=(scanner,), daemon=True)
+                 for scanner in self.scanners
+                 if scanner.container is not None and not scanner.finished.is_set()]
+        for stop in stops:
+            stop.start()
+        for stop in stops:
+            stop.join()
+
+    def run(self):
+        self.dispatcher.place(self.scanners)
+        with tqdm(total=len(self.scanners), desc="[#] Building docker images") as pbar:
+            self._pbar = pbar
+            for scanner in self.scanners:
+                scanner.progress = self._progress
+            chains = [threading.Thread(target=self._chain, args=(scanner,), daemon=True)
+                      for scanner in self.scanners]
+            for chain in chains:
+                chain.start()
+            for chain in chains:
+                chain.join()
+            with self._progress_lock:
+                self._pbar = None
+        self.dispatcher.close()
@@ -9,10 +9,11 @@ import json
 import sys
 from enum import Enum
 from sqlite3 import DatabaseError
+from docker.errors import DockerException
 
 from robot_api.robot import Robot
 from robot_api.parse import parse_args, join_abs
-from robot_api.config import load_config, generate_configs, tool_check, get_config
+from robot_api.config import load_config, load_settings, generate_configs, tool_check, get_config
 
 
 ROOT_DIR = path.join(environ.get("HOME","."),".drrobot")
@@ -28,6 +29,7 @@ class Mode(Enum):
     """
     DOCKER = 1
     ANSIBLE = 2
+    NATIVE = 3
 
 
 def setup_logger():
@@ -117,9 +119,19 @@ def start_gather(drrobot, tools, parser):
         print(f"Scanners as Ansible Play: \
                 {json.dumps(scanners_ansible, indent=4)}")
 
+    scanners_native = {k: v for k, v
+                       in tools.get("scanners").items()
+                       if getattr(args, k)
+                       is True
+                       and Mode[v["mode"]] == Mode.NATIVE}
+    if verbose:
+        print(f"Scanners as native tools: \
+                {json.dumps(scanners_native, indent=4)}")
+
     if not webtools and \
         not scanners_ansible and \
-            not scanners_dockers:
+            not scanners_dockers and \
+            not scanners_native:
         print("[*] No scanners/webtools provided, exiting...")
         parser.print_help()
         sys.exit(0)
@@ -127,6 +139,7 @@ def start_gather(drrobot, tools, parser):
     drrobot.gather(
         webtools=webtools,
         scanners_dockers=scanners_dockers,
+        scanners_native=scanners_native,
         scanners_ansible=scanners_ansible,
         headers=getattr(
             args,
@@ -162,7 +175,16 @@ def start_inspect(drrobot, tools, parser):
         print(f"Inspection ansible \
                     {json.dumps(post_enum_ansible, indent=4)}")
 
-    if not post_enum_ansible and not post_enum_dockers:
+    post_enum_native = {k: v for k, v
+                        in tools.get("enumeration").items()
+                        if getattr(args, k)
+                        is True
+                        and Mode[v["mode"]] == Mode.NATIVE}
+    if verbose:
+        print(f"Inspection native \
+                    {json.dumps(post_enum_native, indent=4)}")
+
+    if not post_enum_ansible and not post_enum_dockers and not post_enum_native:
         print("[*] No scanners/webtools provided, exiting...")
         parser.print_help()
         sys.exit(0)
@@ -171,7 +193,10 @@ def start_inspect(drrobot, tools, parser):
     drrobot.inspection(
         post_enum_ansible=post_enum_ansible,
         post_enum_dockers=post_enum_dockers,
-        file=_file)
+        post_enum_native=post_enum_native,
+        file=_file,
+        live=getattr(args, 'live', False),
+        collapse=getattr(args, 'collapse', False))
 
 
 def start_upload(drrobot, tools, parser):
@@ -250,6 +275,51 @@ def start_dumpdb(drrobot, parser):
         print("[!] DB file does not exists, try running gather first")
 
 
+def start_search(drrobot, parser):
+    """Search collected headers
+
+    Runs a full text query against the headers gathered with --headers
+    """
+    args = parser.parse_args()
+    dbpath = getattr(args, "dbfile")
+
+    if path.exists(dbpath):
+        drrobot.search(getattr(args, "query"))
+    else:
+        print("[!] DB file does not exists, try running gather first")
+
+
+def start_images(drrobot, parser):
+    """Export or import the scanner images
+
+    Export saves every image built by Dr.ROBOT into a single archive,
+    import loads that archive on every docker endpoint
+    """
+    args = parser.parse_args()
+    filename = getattr(args, "file")
+
+    if getattr(args, "image_action") == "export":
+        drrobot.export_images(filename)
+    elif path.exists(filename):
+        drrobot.import_images(filename)
+    else:
+        print(f"[!] Image archive {filename} does not exist, run images export first")
+
+
+def start_stats(drrobot, parser):
+    """Show recorded resource usage
+
+    Summarises the resource samples per scanner and per run
+    """
+    args = parser.parse_args()
+    dbpath = getattr(args, "dbfile")
+
+    if path.exists(dbpath):
+        drrobot.stats(getattr(args, "runs"))
+    else:
+        print("[!] DB file does not exists, try running gather first")
+
+
 def start_output(drrobot, parser):
     """Generate output
 
@@ -291,6 +361,7 @@ def run():
 
         drrobot = Robot(root_dir=ROOT_DIR,
                         user_config=get_config(),
+                        settings=load_settings(get_config()),
                         **tools,
                         dns=getattr(args, 'dns', None),
                         proxy=getattr(args, 'proxy', None),
@@ -323,6 +394,15 @@ def run():
         if args.actions in "dumpdb":
             start_dumpdb(drrobot, parser)
 
+        if args.actions in "search":
+            start_search(drrobot, parser)
+
+        if args.actions in "images":
+            start_images(drrobot, parser)
+
+        if args.actions in "stats":
+            start_stats(drrobot, parser)
+
     except json.JSONDecodeError as error:
         print(f"[!] JSON load error, configuration file is bad.\n {error}")
         log.exception(error)
@@ -331,6 +411,9 @@ def run():
         log.exception(error)
     except KeyboardInterrupt:
         print("[!] KeyboardInterrup, exiting...")
+    except DockerException as error:
+        log.exception(error)
+        print(f"[!] Docker error {error}")
     except OSError as error:
         log.exception(error)
         print(f"[!] OSError {error}")
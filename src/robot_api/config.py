@@ -32,9 +32,6 @@ def generate_configs():
     if not path.exists(path.join(CONFIG_DIR, "docker_active")):
         makedirs(path.join(CONFIG_DIR, "docker_active"))
 
-    if not path.exists(path.join(CONFIG_DIR, "tarfiles")):
-        makedirs(path.join(CONFIG_DIR, "tarfiles"))
-
     if not path.exists(path.join(CONFIG_DIR, "certs")):
         makedirs(path.join(CONFIG_DIR, "certs"))
 
@@ -111,6 +108,21 @@ def load_config(config):
             "upload_dest": upload_dest}
 
 
+def load_settings(config):
+    """Load the Settings section of the json file in the USERS home directory
+
+    Returns:
+        A dict of global settings for Dr.ROBOT :
+
+        { "Docker" : {...} }
+    """
+
+    with open(config, 'r') as f:
+        config = json.load(f)
+
+    return config.get('Settings', {})
+
+
 def get_config():
     """Utility to fetch the path to the configuration file.
 
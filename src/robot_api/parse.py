@@ -141,6 +141,18 @@ def parse_args(
                                 type=str,
                                 help="File to use for inspection")
 
+    parser_inspect.add_argument("--live",
+                                action='store_true',
+                                help="Only inspect endpoints that answered the header probe "
+                                "of gather --headers, ignored with --file",
+                                default=False)
+
+    parser_inspect.add_argument("--collapse",
+                                action='store_true',
+                                help="Probe every endpoint and inspect one per ip and response "
+                                "fingerprint, the others are stored in the aliases table",
+                                default=False)
+
     parser_inspect.add_argument("domain",
                                 type=str,
                                 help="Domain to run scan against")
@@ -200,6 +212,62 @@ def parse_args(
                                type=str,
                                help="Domain to show data for")
     ##########################
+    # SEARCH
+    ##########################
+
+    parser_search = subparser.add_parser(
+        "search",
+        help="Full text search over the headers collected with --headers")
+
+    parser_search.add_argument(
+        "query",
+        type=str,
+        help="FTS5 query e.g. 'nginx' or '\"X-Powered-By\" AND PHP'")
+
+    parser_search.add_argument("domain",
+                               type=str,
+                               help="Domain to search headers of")
+    ##########################
+    # IMAGES
+    ##########################
+
+    parser_images = subparser.add_parser(
+        "images",
+        help="Export the built scanner images to a single archive or "
+        "import them on a new host to skip building")
+
+    parser_images.add_argument(
+        "image_action",
+        choices=[
+            "export",
+            "import"],
+        help="Save all built images to the archive or load them from it")
+
+    parser_images.add_argument(
+        "--file",
+        default=join_abs(root_dir, "images.tar"),
+        type=str,
+        help="Archive to write/read, gzip compressed if it ends in .gz")
+    ##########################
+    # STATS
+    ##########################
+
+    parser_stats = subparser.add_parser(
+        "stats",
+        help="Show the cpu, memory, network and disk usage recorded "
+        "for every scanner and its latest runs")
+
+    parser_stats.add_argument(
+        "--runs",
+        default=20,
+        type=int,
+        help="Number of latest runs to list")
+
+    parser_stats.add_argument("domain",
+                              type=str,
+                              nargs="?",
+                              help="Only show runs against this domain")
+    ##########################
     # OUTPUT
     ##########################
     parser_output = subparser.add_parser(
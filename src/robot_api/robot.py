@@ -15,16 +15,22 @@ Attributess:
 import importlib
 import json
 from os import makedirs, walk
-from os.path import exists, isfile, getsize, isdir
+from os.path import basename, dirname, exists, isfile, getsize, isdir
 import logging
-import threading
+import time
 import multiprocessing
+import subprocess
 from xml.dom.minidom import parseString
 import requests
 from tqdm import tqdm
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import dicttoxml
-from robot_api.api import Ansible, Docker, Aggregation
+from robot_api.api import Ansible, Docker, Aggregation, BaseImage
+from robot_api.api.ansible import AnsibleExecutor, inventory_hosts, shard_infile
+from robot_api.api.images import export_images, import_images
+from robot_api.api.ingest import OutputWatcher
+from robot_api.api.native import Native
+from robot_api.api.scheduler import Dispatcher, Pipeline, connect_endpoints, resolve_dependencies
 from robot_api.parse import join_abs
 
 
@@ -41,6 +47,7 @@ class Robot:
             root_dir (str): Base directory containing config.json and template folders
             verbose (bool): verbose output on/off
             dbfile (str): Alternative database file to use
+            settings (Dict): Settings section of config.json
 
         Returns:
             None
@@ -55,6 +62,8 @@ class Robot:
         self.proxy = kwargs.get("proxy", None)
         self.verbose = kwargs.get("verbose", False)
         self.dbfile = kwargs.get("dbfile")
+        self.settings = kwargs.get("settings") or {}
+        self._bases = None
 
         # Disable warnings for insecure requests
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -69,6 +78,32 @@ class Robot:
             print("\t[D] " + msg)
         LOG.debug(msg)
 
+    def _base_images(self):
+        """Shared base images from the "base_images" Docker settings
+
+        Created once so the gather and inspection phases share them.
+
+        Returns:
+            (Dict) base image key -> BaseImage
+        """
+        if self._bases is None:
+            self._bases = {}
+            for key, base_dict in self.settings.get("Docker", {}).get("base_images", {}).items():
+                options = dict(base_dict)
+                options.update({"name": key})
+                options.update({"proxy": self.proxy or None})
+                options.update({"dns": self.dns or None})
+                options.update({"verbose": self.verbose})
+                options.update({"certs": join_abs(self.ROOT_DIR, "certs")})
+                self._bases[key] = BaseImage(
+                    active_config_path=join_abs(self.ROOT_DIR, base_dict['active_conf']),
+                    default_config_path=join_abs(self.ROOT_DIR, base_dict['default_conf']),
+                    docker_options=options,
+                    log_dir=join_abs(self.ROOT_DIR, "logs"),
+                    log_max_bytes=self.settings.get("Docker", {}).get("log_max_bytes"),
+                    verbose=self.verbose)
+        return self._bases
+
     def _run_dockers(self, dockers):
         """Build Docker containers provided dictionary of arguments for building
 
@@ -94,11 +129,18 @@ class Robot:
                   }
                 }
 
+        Each container is started as soon as its own image is built,
+        every scanner listed in its "depends_on" has finished and the
+        Scheduler has room for its "resources".
+
         Returns:
-            A tuple containing the threads and the scanners being ran
+            A tuple containing the pipeline thread and the scanners being ran
 
         """
-        scanners = []
+        docker_settings = self.settings.get("Docker", {})
+        if docker_settings.get("warm_pool") and not docker_settings.get("parameterized_target"):
+            print("[!] warm_pool requires parameterized_target, starting new containers instead")
+        scanners = {}
         self._print(f"Creating scanners{dockers.keys()}")
         for scan, scan_dict in dockers.items():
             options = scan_dict
@@ -106,7 +148,6 @@ class Robot:
             options.update({"dns": self.dns or None})
             options.update({"target": self.domain})
             options.update({"verbose": self.verbose})
-            options.update({"tarfiles": join_abs(self.ROOT_DIR, "tarfiles")})
             options.update({"certs": join_abs(self.ROOT_DIR, "certs")})
             output_dir = self.OUTPUT_DIR
             if options.get("output_folder", None):
@@ -116,42 +157,129 @@ class Robot:
             self._print(f"Creating scanner for {scan} with options: " +
                         "{json.dumps(options, indent=4)}")
 
-            scanners += [
-                Docker(
-                    active_config_path=join_abs(
-                        self.ROOT_DIR,
-                        scan_dict['active_conf']),
-                    default_config_path=join_abs(
-                        self.ROOT_DIR,
-                        scan_dict['default_conf']),
-                    docker_options=options,
-                    output_dir=output_dir)]
-
-        self._print("Threading builds")
-        build_threads = [threading.Thread(target=scanner.build, daemon=True) for scanner in scanners]
-        for build in build_threads:
-            build.start()
-
-        build_monitor_threads = [threading.Thread(target=scanner.monitor_build, daemon=True) for scanner in scanners]
-        for thread in build_monitor_threads:
-            thread.start()
+            base = None
+            if options.get("base", None):
+                base = self._base_images().get(options.get("base"))
+                if base is None:
+                    print(f"[!] Unknown base image {options.get('base')} for {scan}")
+
+            scanners[scan] = Docker(
+                active_config_path=join_abs(
+                    self.ROOT_DIR,
+                    scan_dict['active_conf']),
+                default_config_path=join_abs(
+                    self.ROOT_DIR,
+                    scan_dict['default_conf']),
+                docker_options=options,
+                output_dir=output_dir,
+                base=base,
+                parameterized=docker_settings.get("parameterized_target", False),
+                warm=docker_settings.get("warm_pool", False),
+                log_dir=join_abs(self.ROOT_DIR, "logs"),
+                log_max_bytes=docker_settings.get("log_max_bytes"),
+                stats_interval=docker_settings.get("stats_interval", 0))
+
+        dependencies = resolve_dependencies(scanners, dockers)
+
+        # One shared client, scheduler and watcher per docker endpoint
+        dispatcher = Dispatcher.from_settings(docker_settings,
+                                              self.aggregation.run_history())
+
+        timeouts = self.settings.get("Timeouts", {})
+        self._print("Starting build -> run pipeline")
+        pipeline = Pipeline(list(scanners.values()), dependencies, dispatcher,
+                            default_timeout=timeouts.get("scanner", 0),
+                            stop_grace=timeouts.get("stop_grace", 10))
+        pipeline.start()
+
+        return ([pipeline], list(scanners.values()))
+
+    def _run_natives(self, natives):
+        """Run tools installed on the host as subprocesses
 
-        for build in build_monitor_threads:
-            build.join()
+        Args:
+            natives (Dict): dictionary of tools with mode NATIVE
 
-        for scanner in scanners:
-            if scanner.error or scanner.image is None:
-                print(f"[!] Error building {scanner.name}. Check logs")
+                Example:
+                {
+                "Amass" : {
+                    "name": "Amass",
+                    "mode": "NATIVE",
+                    "native_command": "amass enum --passive -d $target",
+                    "native_output": "amass.txt",
+                    "output_folder": "amass"
+                  }
+                }
 
-        self._print("Images built, running containers")
-        for scanner in scanners:
-            scanner.run()
+        Returns:
+            A tuple containing the started threads and the tools being ran,
+            every Native is its own thread
+        """
+        timeouts = self.settings.get("Timeouts", {})
+        tools = []
+        for name, native_dict in natives.items():
+            options = dict(native_dict)
+            options.update({"proxy": self.proxy or None})
+            options.update({"dns": self.dns or None})
+            options.update({"target": self.domain})
+            options.update({"outdir": self.OUTPUT_DIR})
+            output_dir = join_abs(self.OUTPUT_DIR,
+                                  options.get("output_folder") or options["name"].lower())
+
+            self._print(f"Creating native tool for {name} with options: " +
+                        f"{json.dumps(options, indent=4)}")
+            tool = Native(native_options=options,
+                          output_dir=output_dir,
+                          log_dir=join_abs(self.ROOT_DIR, "logs"),
+                          default_timeout=timeouts.get("scanner", 0),
+                          stop_grace=timeouts.get("stop_grace", 10),
+                          verbose=self.verbose)
+            tool.start()
+            tools += [tool]
+        return (tools, list(tools))
+
+    def _join_threads(self, threads, scanners, timeout=None):
+        """Wait on the threads/processes of a phase
+
+        Anything still running once timeout seconds have passed is stopped
+        so the phase can continue with whatever output has been written.
 
-        status_threads = [threading.Thread(target=scanner.update_status, daemon=True) for scanner in scanners]
-        for stat in status_threads:
-            stat.start()
+        Args:
+            threads (List): threads and processes started for the phase
+            scanners (List): Docker objects to kill on KeyboardInterrupt
+            timeout (int): seconds the phase may take, 0/None for no limit
 
-        return (status_threads, scanners)
+        Returns:
+            (bool) True if everything finished within the timeout
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        threads = [thread for thread in threads if thread]
+        try:
+            for thread in threads:
+                thread.join(None if deadline is None
+                            else max(deadline - time.monotonic(), 0))
+        except KeyboardInterrupt:
+            self._print("Keyboard Interrupt sending kill signal to docker")
+            for scanner in scanners:
+                try:
+                    scanner.kill()
+                except Exception:
+                    pass
+            raise KeyboardInterrupt
+
+        running = [thread for thread in threads if thread.is_alive()]
+        if not running:
+            return True
+
+        print(f"[!] Phase timeout of {timeout}s reached, stopping remaining tools")
+        for thread in running:
+            if isinstance(thread, (Pipeline, Native, AnsibleExecutor)):
+                thread.stop()
+            elif isinstance(thread, multiprocessing.Process):
+                thread.terminate()
+        for thread in running:
+            thread.join(self.settings.get("Timeouts", {}).get("stop_grace", 10))
+        return False
 
     def _run_ansible(self, ansible_mods, infile):
         """Create ansible objects from dictionary containing the configurations.
@@ -181,10 +309,15 @@ class Robot:
                     }
                 }
 
-        Returns:
+        Plays run on an AnsibleExecutor, at most "max_plays" of the
+        "Ansible" settings at once.
 
+        Returns:
+            (List) with the started AnsibleExecutor, empty if nothing was run
         """
-        ansible_threads = []
+        ansible_settings = self.settings.get("Ansible", {})
+        max_plays = ansible_settings.get("max_plays", 2)
+        plays = []
         for ansible, ansible_json in ansible_mods.items():
             try:
                 attr = {}
@@ -202,7 +335,7 @@ class Robot:
                 
                 if not isfile(infile):
                     print("[!] file provided does not exist, terminating")
-                    return
+                    return []
 
                 attr['infile'] = infile
                 attr['domain'] = self.domain
@@ -212,18 +345,29 @@ class Robot:
                 attr['ansible_arguments'] = ansible_json.get(
                     "ansible_arguments")
                 attr['verbose'] = self.verbose
+                attr['name'] = ansible
+                attr['log_dir'] = join_abs(self.ROOT_DIR, "logs")
+                attr['log_max_bytes'] = self.settings.get("Docker", {}).get("log_max_bytes")
+                attr['forks'] = ansible_settings.get("forks", 0)
+                attr['provision'] = ansible_settings.get("skip_provisioned", True)
 
                 self._print(
                     f"Creating ansible {ansible} with attributes\n\t {attr}")
                 ansible_mod = Ansible(**attr)
                 ansible_mod.build()
-                
-                if ansible_json.get('ansible_arguments').get("run_as_thread", False):
-                    thread = threading.Thread(target=ansible_mod.run, daemon=True)
-                    thread.start()
-                    ansible_threads += [thread]
+
+                exclusive = not ansible_json.get('ansible_arguments').get("run_as_thread", False)
+                shards = self._ansible_shards(ansible, ansible_json, ansible_mod, infile)
+                if len(shards) > 1:
+                    print(f"[*] Splitting {ansible} targets across {len(shards)} hosts")
+                    for host, shard_file in shards.items():
+                        shard_mod = Ansible(**attr, shard={"host": host, "infile": shard_file})
+                        shard_mod.build()
+                        plays += [(shard_mod, exclusive)]
+                    # Every shard of a play runs at once
+                    max_plays = max(max_plays, len(shards))
                 else:
-                    ansible_mod.run()
+                    plays += [(ansible_mod, exclusive)]
 
             except OSError:
                 print(f"[!] Something went wrong. Check error log for details")
@@ -231,9 +375,44 @@ class Robot:
             except TypeError:
                 print(f"[!] Something went wrong. Check error log for details")
                 LOG.exception("Error in ansible method")
+            except ValueError as error:
+                print(f"[!] Skipping {ansible}: {error}")
+                LOG.error("Ansible %s not started: %s", ansible, error)
+
+        if not plays:
+            return []
+        executor = AnsibleExecutor(plays,
+                                   max_plays=max_plays,
+                                   stop_grace=self.settings.get("Timeouts", {}).get("stop_grace", 10))
+        executor.start()
+        return [executor]
+
+    def _ansible_shards(self, name, ansible_json, ansible_mod, infile):
+        """Split infile across the inventory hosts of a play with "shard" set
 
-        for ansible in ansible_threads:
-            ansible.join()
+        Args:
+            name (str): name of the ansible module
+            ansible_json (Dict): configuration of the module
+            ansible_mod (Ansible): built play running the whole infile
+            infile (str): targets of the play
+
+        Returns:
+            (Dict) host -> shard file, empty if the play is not sharded
+        """
+        shard = ansible_json.get('ansible_arguments', {}).get("shard", False)
+        if not shard:
+            return {}
+        if ansible_mod.inventory is None:
+            print(f"[!] {name} has shard set but no inventory (-i) in its flags")
+            return {}
+        group = shard if isinstance(shard, str) else "all"
+        try:
+            hosts = inventory_hosts(ansible_mod.inventory, group)
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            print(f"[!] Could not read hosts of {ansible_mod.inventory}, running {name} unsharded")
+            LOG.exception("Reading ansible inventory")
+            return {}
+        return shard_infile(infile, hosts, join_abs(self.OUTPUT_DIR, "shards", name.lower()))
 
     def _run_webtools(self, webtools):
         """Create custom WebTool object from dictionary containing WebTools
@@ -385,6 +564,7 @@ class Robot:
         Args:
             webtools (Dict): webtool dict
             scanners_dockers (Dict): scanners that use docker as their base
+            scanners_native (Dict): scanners installed on the host
             scanners_ansible (Dict): scanners that use ansible as their base.
             headers (Boolean): if headers should be gathered
 
@@ -412,6 +592,11 @@ class Robot:
                          v in scanners_dockers.items()
                          if v.get('output_file')]
 
+        scanners_native = kwargs.get('scanners_native', {})
+
+        output_folders += [v.get("output_folder") or v["name"].lower()
+                           for _, v in scanners_native.items()]
+
         scanners_ansible = kwargs.get('scanners_ansible', {})
 
         output_folders += [v.get('output_folder', None)
@@ -425,23 +610,46 @@ class Robot:
             if not exists(join_abs(self.OUTPUT_DIR, folder)):
                 makedirs(join_abs(self.OUTPUT_DIR, folder))
 
+        ingest = self.settings.get("Ingest", {})
+        watcher = None
+        if ingest.get("live", False) and (scanners_dockers or scanners_native or scanners_ansible):
+            # Hosts show up in the database while the tools are still running
+            watcher = OutputWatcher(self.aggregation,
+                                    output_files=output_files,
+                                    output_folders=output_folders,
+                                    poll_interval=ingest.get("poll_interval", 2))
+            watcher.start()
+
+        scanners = []
         if scanners_dockers:
             scanner_threads, scanners = self._run_dockers(scanners_dockers)
             _threads += scanner_threads
 
+        if scanners_native:
+            native_threads, natives = self._run_natives(scanners_native)
+            _threads += native_threads
+            scanners += natives
+
         if scanners_ansible:
             _threads += self._run_ansible(scanners_ansible, None)
 
         if _threads:
-            try:
-                [thread.join() for thread in _threads if thread]
-            except KeyboardInterrupt:
-                self._print("Keyboard Interrupt sending kill signal to docker")
-                try:
-                    _ = [scanner.kill() for scanner in scanners]
-                except:
-                    pass
-                raise KeyboardInterrupt
+            self._join_threads(_threads, scanners,
+                               self.settings.get("Timeouts", {}).get("gather", 0))
+
+        if scanners:
+            self.aggregation.record_runs(scanners)
+
+        ingested = None
+        if watcher is not None:
+            watcher.stop()
+            watcher.join()
+            ingested = watcher.offsets
+            print(f"[*] Ingested {watcher.ingested} hosts while the tools were running")
+
+        timed_out = [scanner.name for scanner in scanners if scanner.timed_out]
+        if timed_out:
+            print(f"[!] Aggregating partial results of timed out scanners: {timed_out}")
 
         verify = kwargs.get('verify', None)
 
@@ -457,7 +665,8 @@ class Robot:
 
         self.aggregation.aggregate(
             output_folders=output_folders,
-            output_files=output_files)
+            output_files=output_files,
+            ingested=ingested)
 
         self.aggregation.dump_to_file()
 
@@ -470,8 +679,11 @@ class Robot:
 
         Args:
             post_enum_dockers (Dict): Tools to use docker as their base
+            post_enum_native (Dict): Tools installed on the host
             post_enum_ansible (Dict): Tools to use ansible as their base.
             infile (str): Path to file to use as alternative to infile
+            live (bool): Only inspect endpoints that answered the header probe
+            collapse (bool): Inspect one endpoint per ip and response fingerprint
 
         Returns:
 
@@ -483,27 +695,76 @@ class Robot:
         print("[*] Inspection beginning")
         post_enum_dockers = kwargs.get("post_enum_dockers")
 
+        if kwargs.get("live", False) and infile is None:
+            infile, count = self.aggregation.dump_live_hosts()
+            if infile is None:
+                print("[!] Could not write the live endpoints, see logs")
+                return
+            if not count:
+                print("[!] No endpoint answered the header probe. Run gather with --headers first")
+                return
+            print(f"[*] Inspecting {count} live endpoints from {infile}")
+
+        if kwargs.get("collapse", False):
+            source = infile
+            if source is None:
+                source = join_abs(self.OUTPUT_DIR, "aggregated", "aggregated_protocol_hostnames.txt")
+                if exists(self.dbfile) and getsize(self.dbfile) > 0:
+                    self.aggregation.dump_to_file()
+            if not isfile(source):
+                print(f"[!] {source} does not exist, nothing to collapse")
+                return
+            infile, count = self.aggregation.dump_collapsed(source)
+            if infile is None:
+                return
+            print(f"[*] Inspecting {count} endpoints from {infile}")
+
+        if infile is not None and infile != kwargs.get('file', None):
+            self._retarget_infile(post_enum_dockers, infile)
+            self._retarget_infile(kwargs.get("post_enum_native"), infile)
+
+        post_doc = []
         if post_enum_dockers:
             post_threads, post_doc = self._run_dockers(post_enum_dockers)
             _threads += post_threads
 
+        post_enum_native = kwargs.get("post_enum_native")
+
+        if post_enum_native:
+            native_threads, natives = self._run_natives(post_enum_native)
+            _threads += native_threads
+            post_doc += natives
+
         post_enum_ansible = kwargs.get("post_enum_ansible")
 
         if post_enum_ansible:
-            print("[*] Custom modules will be run on main thread due " +
-                  "to possibility of user input")
-            self._run_ansible(post_enum_ansible, infile)
+            _threads += self._run_ansible(post_enum_ansible, infile)
 
         if _threads:
-            try:
-                [thread.join() for thread in _threads if thread]
-            except KeyboardInterrupt:
-                self._print("Keyboard Interrupt sending kill signal to docker")
-                _ = [doc.kill() for doc in post_doc]
-                raise KeyboardInterrupt
+            self._join_threads(_threads, post_doc,
+                               self.settings.get("Timeouts", {}).get("inspect", 0))
+            self.aggregation.record_runs(post_doc)
 
         print("[*] Inspection Done")
 
+    @staticmethod
+    def _retarget_infile(tools, infile):
+        """Point the tools reading aggregated_protocol_hostnames.txt to infile
+
+        Tools reading other aggregated files (e.g. bare hostnames) keep them.
+
+        Args:
+            tools (Dict): docker or native tools of the inspection
+            infile (str): file written by Aggregation.dump_live_hosts or dump_collapsed
+
+        Returns:
+
+        """
+        for options in (tools or {}).values():
+            current = options.get("infile", None)
+            if current and basename(current) == "aggregated_protocol_hostnames.txt":
+                options["infile"] = join_abs(dirname(current), basename(infile))
+
     def upload(self, **kwargs):
         """Uploads files under filepath to upload destination
 
@@ -582,6 +843,104 @@ class Robot:
                 self._print("Error in generate_output check logs")
                 LOG.exception("Error in generate output")
 
+    def search(self, query):
+        """Search collected HTTP/HTTPS headers of the domain
+
+        Args:
+            query (str): FTS5 query to run against the header index
+
+        Returns:
+            (List) tuples of hostname, ip and matching snippet
+        """
+        results = self.aggregation.search_headers(query)
+        print(f"[*] {len(results)} hosts matching {query}")
+        for hostname, ipv4, snippet in results:
+            print(f"{hostname or ''}\t{ipv4 or ''}\t{snippet}")
+        return results
+
+    def export_images(self, filename):
+        """Save every scanner image built on the local daemon into one archive
+
+        Args:
+            filename (str): archive to write
+
+        Returns:
+            (List) tags of the exported images
+        """
+        settings = {**self.settings.get("Docker", {}), "endpoints": []}
+        (_, _, client), = connect_endpoints(settings)
+        exported = export_images(client, filename)
+        print(f"[*] Exported {len(exported)} images to {filename}")
+        return exported
+
+    def import_images(self, filename):
+        """Load an archive from export_images into every docker endpoint
+
+        Args:
+            filename (str): archive written by export_images
+
+        Returns:
+            (List) tags of the imported images
+        """
+        imported = []
+        for _, name, client in connect_endpoints(self.settings.get("Docker", {})):
+            tags = import_images(client, filename)
+            print(f"[*] Imported {len(tags)} images on {name}")
+            imported += tags
+        return imported
+
+    @staticmethod
+    def _sizeof(value):
+        """Human readable byte count, - if nothing was recorded"""
+        if value is None:
+            return "-"
+        return tqdm.format_sizeof(value, "B", 1024)
+
+    @staticmethod
+    def _percent(value):
+        return "-" if value is None else f"{value:.0f}%"
+
+    @staticmethod
+    def _seconds(value):
+        return "-" if value is None else f"{value:.0f}s"
+
+    def stats(self, limit=20):
+        """Print the recorded resource usage per scanner and of the latest runs
+
+        Covers every domain in the database unless a domain was given.
+
+        Args:
+            limit (int): number of latest runs to list
+
+        Returns:
+            (Tuple) rows per scanner and rows per run
+        """
+        aggregation = Aggregation(self.dbfile, self.domain, None)
+        scanners = aggregation.scanner_stats()
+        runs = aggregation.run_stats(limit)
+        print(f"[*] Resource usage of {len(scanners)} scanners" +
+              (f" for {self.domain}" if self.domain else ""))
+        print("scanner\truns\ttimed out\trun time\tcpu avg\tcpu peak\t" +
+              "rss peak\tnet rx\tnet tx\tblock read\tblock write\toutput")
+        for (name, count, timed_out, run_seconds, cpu_avg, cpu_max, rss_max,
+             net_rx, net_tx, block_read, block_write, output) in scanners:
+            print(f"{name}\t{count}\t{timed_out or 0}\t{self._seconds(run_seconds)}\t" +
+                  f"{self._percent(cpu_avg)}\t{self._percent(cpu_max)}\t{self._sizeof(rss_max)}\t" +
+                  f"{self._sizeof(net_rx)}\t{self._sizeof(net_tx)}\t" +
+                  f"{self._sizeof(block_read)}\t{self._sizeof(block_write)}\t{self._sizeof(output)}")
+
+        print(f"\n[*] Latest {len(runs)} runs")
+        print("run\tscanner\tdomain\tstarted\trun time\texit\tcpu avg\tcpu peak\t" +
+              "rss peak\tnet rx\tnet tx\tblock read\tblock write\toutput")
+        for (runid, name, domain, started, run_seconds, exit_code, timed_out, cpu_avg,
+             cpu_max, rss_max, net_rx, net_tx, block_read, block_write, output) in runs:
+            status = "timeout" if timed_out else ("-" if exit_code is None else exit_code)
+            print(f"{runid}\t{name}\t{domain}\t{started or '-'}\t{self._seconds(run_seconds)}\t" +
+                  f"{status}\t{self._percent(cpu_avg)}\t{self._percent(cpu_max)}\t" +
+                  f"{self._sizeof(rss_max)}\t{self._sizeof(net_rx)}\t{self._sizeof(net_tx)}\t" +
+                  f"{self._sizeof(block_read)}\t{self._sizeof(block_write)}\t{self._sizeof(output)}")
+        return scanners, runs
+
     def dumpdb(self):
         """Dumps the contents of the db file.
         """
@@ -0,0 +1,66 @@
+import pytest
+
+from robot_api.api import aggregation
+from robot_api.api.aggregation import Aggregation
+
+
+@pytest.fixture
+def aggregation_db(tmp_path):
+    agg = Aggregation(str(tmp_path / "drrobot.db"), "example.com", str(tmp_path))
+    agg.open_db().close()
+    return agg
+
+
+def test_live_endpoints_groups_schemes_by_host(aggregation_db):
+    dbconn = aggregation_db.open_db()
+    dbconn.executemany("INSERT INTO data(domain, ip, hostname, http_headers, https_headers) "
+                       "VALUES ('example_com', ?, ?, ?, ?)",
+                       [("10.0.0.2", "www.example.com", "{}", "{}"),
+                        ("10.0.0.1", "api.example.com", None, "{}"),
+                        ("10.0.0.3", None, "{}", None),
+                        ("10.0.0.4", "dead.example.com", None, None)])
+    dbconn.close()
+    assert aggregation_db.live_endpoints() == ["http://10.0.0.3",
+                                               "https://api.example.com",
+                                               "http://www.example.com",
+                                               "https://www.example.com"]
+
+
+class InlinePool:
+    def __init__(self, processes):
+        pass
+
+    def imap_unordered(self, func, iterable):
+        return map(func, iterable)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+def test_collapse_groups_by_scheme_ip_port_and_fingerprint(aggregation_db, monkeypatch):
+    probes = {"http://a.example.com": ("10.0.0.1", "same"),
+              "http://cdn.example.com": ("10.0.0.1", "same"),
+              "http://cdn.example.com:80": ("10.0.0.1", "same"),
+              "https://cdn.example.com": ("10.0.0.1", "same"),
+              "http://cdn.example.com:8080": ("10.0.0.1", "same"),
+              "http://other.example.com": ("10.0.0.1", "different"),
+              "http://down.example.com": (None, None)}
+    monkeypatch.setattr(aggregation, "probe_fingerprint", lambda url: (url, *probes[url]))
+    monkeypatch.setattr(aggregation.multiprocessing, "Pool", InlinePool)
+
+    kept = aggregation_db.collapse(list(probes))
+
+    assert kept == ["http://a.example.com",
+                    "https://cdn.example.com",
+                    "http://cdn.example.com:8080",
+                    "http://other.example.com",
+                    "http://down.example.com"]
+    dbconn = aggregation_db.open_db()
+    aliases = dbconn.execute("SELECT endpoint, representative FROM aliases "
+                             "ORDER BY endpoint").fetchall()
+    dbconn.close()
+    assert aliases == [("http://cdn.example.com", "http://a.example.com"),
+                       ("http://cdn.example.com:80", "http://a.example.com")]
@@ -0,0 +1,24 @@
+from robot_api.api.ansible import Ansible, shard_infile
+
+
+def test_shard_infile_balances_targets(tmp_path):
+    infile = tmp_path / "targets.txt"
+    infile.write_text("\n".join(f"https://host{index}.example.com" for index in range(7)) + "\n\n")
+    shards = shard_infile(str(infile), ["a", "b", "c"], str(tmp_path / "shards"))
+    lines = {host: open(path).read().split() for host, path in shards.items()}
+    assert sorted(len(targets) for targets in lines.values()) == [2, 2, 3]
+    assert sorted(sum(lines.values(), [])) == sorted(infile.read_text().split())
+
+
+def test_shard_infile_skips_hosts_without_targets(tmp_path):
+    infile = tmp_path / "targets.txt"
+    infile.write_text("https://www.example.com\n")
+    shards = shard_infile(str(infile), ["a", "b"], str(tmp_path / "shards"))
+    assert list(shards) == ["a"]
+
+
+def test_prompt_flag():
+    assert Ansible.prompt_flag(["ansible-playbook", "play.yml", "-K"]) == "-K"
+    assert Ansible.prompt_flag(["ansible-playbook", "-vvvk"]) == "-vvvk"
+    assert Ansible.prompt_flag(["ansible-playbook", "--vault-id", "dev@prompt"]) == "dev@prompt"
+    assert Ansible.prompt_flag(["ansible-playbook", "-i", "hosts", "-e", "k=v", "--forks", "5"]) is None
@@ -0,0 +1,38 @@
+from robot_api.api.dockerize import Docker, is_local_url
+
+
+def test_is_local_url(monkeypatch):
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    assert is_local_url(None)
+    assert is_local_url("unix:///var/run/docker.sock")
+    assert is_local_url("npipe:////./pipe/docker_engine")
+    assert not is_local_url("ssh://user@remote")
+    assert not is_local_url("tcp://remote:2376")
+    monkeypatch.setenv("DOCKER_HOST", "ssh://user@remote")
+    assert not is_local_url(None)
+
+
+def test_parse_stats():
+    stats = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 3000}, "system_cpu_usage": 20000,
+                      "online_cpus": 2},
+        "precpu_stats": {"cpu_usage": {"total_usage": 1000}, "system_cpu_usage": 10000},
+        "memory_stats": {"usage": 500, "stats": {"inactive_file": 100}},
+        "networks": {"eth0": {"rx_bytes": 10, "tx_bytes": 20},
+                     "eth1": {"rx_bytes": 1, "tx_bytes": 2}},
+        "blkio_stats": {"io_service_bytes_recursive": [{"op": "Read", "value": 7},
+                                                       {"op": "Write", "value": 9},
+                                                       {"op": "read", "value": 1}]},
+    }
+    _, cpu, rss, net_rx, net_tx, block_read, block_write = Docker._parse_stats(stats)
+    assert cpu == 40.0
+    assert rss == 400
+    assert (net_rx, net_tx) == (11, 22)
+    assert (block_read, block_write) == (8, 9)
+
+
+def test_parse_stats_host_network_and_stopped_container():
+    sample = Docker._parse_stats({"memory_stats": {"usage": 10, "stats": {"rss": 4}}})
+    assert sample[2] == 4
+    assert sample[3] is None and sample[4] is None
+    assert Docker._parse_stats({"memory_stats": {}}) is None
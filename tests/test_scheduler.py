@@ -0,0 +1,128 @@
+import pytest
+from docker.errors import DockerException
+
+from robot_api.api import scheduler
+from robot_api.api.scheduler import Dispatcher, Endpoint, Scheduler, resolve_dependencies
+
+
+class StubEvents:
+    def __iter__(self):
+        return iter(())
+
+    def close(self):
+        pass
+
+
+class StubClient:
+    """Docker client answering the calls made while connecting and placing"""
+    def __init__(self, name, reachable=True, cpus=4):
+        self.name = name
+        self.reachable = reachable
+        self.cpus = cpus
+
+    def ping(self):
+        if not self.reachable:
+            raise DockerException(f"{self.name} is down")
+        return True
+
+    def info(self):
+        return {"NCPU": self.cpus, "MemTotal": 8 * 1024 ** 3}
+
+    def events(self, **kwargs):
+        return StubEvents()
+
+
+class StubScanner:
+    def __init__(self, name, host_volumes=False, warm=False):
+        self.name = name
+        self.host_volumes = host_volumes
+        self.warm = warm
+        self.client = None
+        self.remote = None
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    created = {}
+
+    def get_client(max_pool_size=None, base_url=None, tls=False):
+        name = base_url or "local"
+        created[name] = created.get(name) or StubClient(name, reachable="down" not in name)
+        return created[name]
+
+    monkeypatch.setattr(scheduler, "get_client", get_client)
+    monkeypatch.delenv("DOCKER_HOST", raising=False)
+    return created
+
+
+def test_connect_endpoints_skips_unreachable(clients):
+    connected = scheduler.connect_endpoints({"endpoints": [{"base_url": None},
+                                                           {"base_url": "tcp://down:2376"},
+                                                           {"base_url": "ssh://user@remote"}]})
+    assert [name for _, name, _ in connected] == ["local", "ssh://user@remote"]
+
+
+def test_connect_endpoints_raises_without_any_daemon(clients):
+    with pytest.raises(DockerException):
+        scheduler.connect_endpoints({"endpoints": [{"base_url": "tcp://down:2376"}]})
+
+
+def test_dispatcher_from_settings_marks_local_endpoints(clients):
+    dispatcher = Dispatcher.from_settings({"endpoints": [{"base_url": None},
+                                                         {"base_url": "unix:///var/run/docker.sock"},
+                                                         {"base_url": "ssh://user@remote",
+                                                          "max_containers": 3}]})
+    try:
+        assert [endpoint.local for endpoint in dispatcher.endpoints] == [True, True, False]
+        assert dispatcher.endpoints[2].scheduler.max_containers == 3
+    finally:
+        dispatcher.close()
+
+
+def test_dispatcher_spreads_scanners_across_daemons():
+    history = {"long": 100, "medium": 60, "short": 10, "tiny": 5}
+    local = Endpoint(StubClient("local"), Scheduler(max_containers=1, history=history),
+                     "local", local=True)
+    remote = Endpoint(StubClient("remote"), Scheduler(max_containers=1, history=history),
+                      "tcp://remote:2376", local=False)
+    dispatcher = Dispatcher([local, remote])
+    scanners = [StubScanner(name) for name in history]
+    try:
+        dispatcher.place(scanners)
+        placed = {scanner.name: dispatcher.endpoint(scanner) for scanner in scanners}
+        assert placed["long"] is not placed["medium"]
+        assert local.expected + remote.expected == sum(history.values())
+        assert sorted((local.expected, remote.expected)) == [75, 100]
+        for scanner in scanners:
+            assert scanner.client is placed[scanner.name].client
+            assert scanner.remote is not placed[scanner.name].local
+    finally:
+        dispatcher.close()
+
+
+def test_dispatcher_keeps_host_volumes_local_and_warm_pool_off_remote():
+    local = Endpoint(StubClient("local"), Scheduler(history={"busy": 1000}), "local", local=True)
+    remote = Endpoint(StubClient("remote"), Scheduler(), "tcp://remote:2376", local=False)
+    dispatcher = Dispatcher([local, remote])
+    busy = StubScanner("busy")
+    mounts = StubScanner("mounts", host_volumes=True)
+    warm = StubScanner("warm", warm=True)
+    try:
+        dispatcher.place([busy, mounts, warm])
+        assert dispatcher.endpoint(mounts) is local
+        assert dispatcher.endpoint(warm) is remote
+        assert warm.warm is False
+    finally:
+        dispatcher.close()
+
+
+def test_resolve_dependencies_breaks_cycles_and_ignores_unknown_scanners():
+    scanners = {key: StubScanner(key) for key in ("amass", "altdns", "massdns")}
+    configs = {"amass": {},
+               "altdns": {"depends_on": ["amass", "massdns", "unknown"]},
+               "massdns": {"depends_on": ["altdns"]}}
+    dependencies = resolve_dependencies(scanners, configs)
+    assert dependencies[scanners["amass"]] == []
+    # dropping one edge is enough to break the cycle
+    assert dependencies[scanners["altdns"]] == [scanners["amass"]]
+    assert dependencies[scanners["massdns"]] == [scanners["altdns"]]